@@ -29,12 +29,450 @@
 # 2-nd round: 0 -> 2 -> 8
 # 3-rd round: 8 -> 2 -> 0
 # if numbers are mixed, we would not get the right result.
+#
+# radix_sort is the array-backed version of the same LSD algorithm. Instead of
+# M linked lists, every pass counts the digits into a histogram, turns the
+# histogram into starting offsets by prefix sum and scatters the numbers into
+# one ping-pong buffer. No node is allocated and no list is walked to find its
+# tail, so each pass is a plain O(N + M) loop over flat lists.
+#   1) The digit width is configurable (8/11/16 bits). Wider digits mean fewer
+#      passes but a larger histogram.
+#   2) Passes stop as soon as the remaining high digits of the max number are
+#      all zero, and a pass whose digits all fall into one bucket is skipped.
+#   3) RadixSort_acc relinks the nodes in the order radix_sorted gives for
+#      the same key, val % m**p. The original linked-list implementation is
+#      kept as _RadixSort_linkedlist for comparison in radix_benchmark.
+#
+#   N (random 32-bit)     10000       100000      1000000
+#   RadixSort_acc       3.485704         -            -
+#   radix_sort(8 bits)  0.024288     0.251184     2.474065
+#   radix_sort(11 bits) 0.019194     0.198777     1.882188
+#   radix_sort(16 bits) 0.028071     0.174465     1.871619
+#   sorted              0.003744     0.060474     0.677245
+#
+# radix_sort is more than 100 times faster than the linked-list version, but
+# sorted() is implemented in C and stays about 3 times faster in CPython.
+#
+# radix_sorted sorts any iterable stably by a `key` evaluated once per element.
+# Keys are mapped to order-preserving unsigned integers first:
+#   signed integers:  key - min(keys)
+#   IEEE-754 floats:  bits | 1<<63 for positive numbers, ~bits for negative ones
+# and the records are moved along with their keys in every counting pass.
+#
+# msd_radix_sort is the American flag sort for variable-length strings. It
+# starts from the most significant byte, partitions every bucket in place by
+# swap cycles, skips the prefix shared by the whole bucket and hands buckets
+# not longer than `cutoff` to insertion_sort of 006_Sort.py. Larger buckets are
+# read by index and never copied, so the extra memory is the stack, 257
+# counters and one copy of at most `cutoff` strings.
+#
+#   N identifiers           10000       100000      1000000
+#   random    msd_radix    0.015103    0.366060    3.554180
+#   random    merge_sort   0.026684    0.384436    5.465437
+#   random    sorted       0.002684    0.043600    0.672202
+#   prefixed  msd_radix    0.026758    0.483411    4.872123
+#   prefixed  merge_sort   0.033451    0.454642    5.835747
+#   prefixed  sorted       0.003887    0.037346    0.910050
+#
+# parallel_radix_sort runs the counting passes of radix_sort in a process
+# pool to get around the GIL. The numbers live in two shared-memory buffers;
+# workers count their chunk, the parent merges the histograms into global
+# offsets, and workers scatter their chunk into the other buffer.
+#
+#   parallel_benchmark, random 32-bit numbers in array('I'), 11-bit digits,
+#   on a machine with one CPU:
+#   N                     300000      1000000
+#   radix_sort           0.455980     1.827839
+#   parallel( 1 worker)  0.716463     2.457537
+#   parallel( 2 workers) 0.875902     2.492952
+#   parallel( 3 workers) 0.882968     2.693836
+#   parallel( 4 workers) 0.887478     2.603629
+#
+# With one CPU the workers only take turns, so the curve above is the cost of
+# the pool: every worker reads and writes the shared buffers through ctypes,
+# and one worker is already 1.3 to 1.6 times slower than radix_sort. The
+# speedup on more than one CPU has not been measured.
+
+import imp
+import os
+from array import array
+from itertools import izip
+from struct import unpack
+
+_sort_module = imp.load_source('sort_module',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '006_Sort.py'))
+
+_SIGN64 = 1 << 63
+_MASK64 = (1 << 64) - 1
+
+
+def radix_sort(nums, radix_bits=8):
+    """
+    LSD radix sort of non-negative integers, sorted in place.
+    : type nums: list or array.array('I'/'L'/'Q')
+    : type radix_bits: int, the number of bits in one digit (8, 11 or 16)
+    : rtype: None
+
+    >>> nums = [64, 8, 216, 512, 27, 729, 0, 1, 343, 125]
+    >>> radix_sort(nums)
+    >>> nums
+    [0, 1, 8, 27, 64, 125, 216, 343, 512, 729]
+    >>> nums = array('I', [70000, 3, 65536, 3, 0])
+    >>> radix_sort(nums, 16)
+    >>> nums.tolist() == [0, 3, 3, 65536, 70000]
+    True
+    """
+    if len(nums) < 2:
+        return
+    if min(nums) < 0:
+        raise ValueError("Radix sort only supports non-negative integers!")
+    _radix_passes(nums, radix_bits)
+
+
+def radix_sorted(items, key=None, radix_bits=8):
+    """
+    Return a new list of `items` stably sorted by `key`, like sorted().
+    Keys may be negative integers or floats. `key` is called exactly once
+    per element. If ints and floats are mixed and some int is not exactly a
+    double, the keys are compared by a stable comparison sort instead.
+    : type items: iterable
+    : type key: callable returning int or float, None to sort the items
+    : rtype: list
+
+    >>> radix_sorted([3, -1, 2**40, -2**40, 0])
+    [-1099511627776, -1, 0, 3, 1099511627776]
+    >>> radix_sorted([1.5, -0.25, float('inf'), -3.0, 0.0])
+    [-3.0, -0.25, 0.0, 1.5, inf]
+    >>> radix_sorted([('b', 2), ('a', 1), ('c', 1)], key=lambda x: x[1])
+    [('a', 1), ('c', 1), ('b', 2)]
+    """
+    res = list(items)
+    if len(res) < 2:
+        return res
+    keys = map(key, res) if key else list(res)
+    unsigned = _unsigned_keys(keys)
+    if unsigned is None:
+        order = sorted(xrange(len(res)), key=keys.__getitem__)
+        return [res[i] for i in order]
+    _radix_passes(unsigned, radix_bits, res)
+    return res
+
+
+def _unsigned_keys(keys):
+    """
+    Map int or float keys to non-negative integers with the same order.
+    Integers are shifted by the min key. Floats are mapped by their IEEE-754
+    bits: the sign bit is set for positive numbers, and all bits are flipped
+    for negative numbers, so the unsigned order is the numeric order.
+    Return None if ints and floats are mixed and some int can't be converted
+    to a float exactly, e.g. 2**53 + 1.
+    """
+    is_int, is_float = True, True
+    for k in keys:
+        if isinstance(k, float):
+            is_int = False
+        elif isinstance(k, (int, long)):
+            is_float = False
+        else:
+            raise TypeError("Radix sort keys should be int or float!")
+    if is_int:
+        lowest = min(keys)
+        return [k - lowest for k in keys] if lowest else keys
+    # -0.0 or 0.0 makes -0.0 equal to 0.0, as in sorted()
+    try:
+        floats = array('d', [float(k) or 0.0 for k in keys])
+    except OverflowError:
+        return None
+    if not is_float:
+        # Python 2.7 compares int and float exactly, so f != k finds the ints
+        # that were rounded (f == f skips nan)
+        for k, f in izip(keys, floats):
+            if f != k and f == f:
+                return None
+    bits = unpack('=%dQ' % len(floats), floats.tostring())
+    return [u ^ _MASK64 if u >> 63 else u | _SIGN64 for u in bits]
+
+
+def _radix_passes(keys, radix_bits, payload=None):
+    """
+    The counting passes of radix sort. `keys` are non-negative integers and
+    sorted in place. If `payload` is given, it is moved along with `keys`.
+    """
+    length = len(keys)
+    if radix_bits <= 0:
+        raise ValueError("radix_bits should be a positive integer!")
+    buckets = 1 << radix_bits
+    mask = buckets - 1
+    max_val = max(keys)
+    # the ping-pong buffer, the result of one pass is the input of the next
+    if isinstance(keys, array):
+        src, dst = keys, array(keys.typecode, keys)
+    else:
+        src, dst = keys, [0] * length
+    if payload is not None:
+        src_load, dst_load = payload, [None] * length
+
+    shift = 0
+    # early exit when the remaining high digits are all zero
+    while max_val >> shift:
+        digits = [(num >> shift) & mask for num in src]
+        counts = [0] * buckets
+        for digit in digits:
+            counts[digit] += 1
+        if counts[digits[0]] == length:
+            # all numbers share this digit, the pass would not move anything
+            shift += radix_bits
+            continue
+        # prefix sum, counts[digit] becomes the first slot of that bucket
+        total = 0
+        for digit in xrange(buckets):
+            counts[digit], total = total, total + counts[digit]
+        if payload is None:
+            for num, digit in izip(src, digits):
+                dst[counts[digit]] = num
+                counts[digit] += 1
+        else:
+            for num, item, digit in izip(src, src_load, digits):
+                slot = counts[digit]
+                dst[slot], dst_load[slot] = num, item
+                counts[digit] = slot + 1
+            src_load, dst_load = dst_load, src_load
+        src, dst = dst, src
+        shift += radix_bits
+    if src is not keys:
+        keys[:] = src
+        if payload is not None:
+            payload[:] = src_load
+
+
+def msd_radix_sort(strings, cutoff=32):
+    """
+    In-place MSD radix sort (American flag sort) of a list of str or unicode.
+    Unicode strings are sorted by their UTF-8 bytes, which keeps the order of
+    code points. A list mixing str and unicode raises TypeError, as their
+    order is not defined by bytes.
+    : type strings: list
+    : type cutoff: int, buckets not longer than cutoff are insertion sorted
+    : rtype: None
+
+    >>> words = ['banana', 'apple', 'app', 'b', '', 'apple', 'ba']
+    >>> msd_radix_sort(words, cutoff=1)
+    >>> words
+    ['', 'app', 'apple', 'apple', 'b', 'ba', 'banana']
+    """
+    if len(strings) < 2:
+        return
+    kinds = set(type(string) for string in strings)
+    if not kinds <= set([str, unicode]):
+        raise TypeError("msd_radix_sort only sorts str or unicode!")
+    if len(kinds) > 1:
+        raise TypeError("msd_radix_sort can't sort str and unicode together!")
+    if unicode in kinds:
+        keys = [string.encode('utf-8') for string in strings]
+        _american_flag(keys, cutoff)
+        strings[:] = [key.decode('utf-8') for key in keys]
+    else:
+        _american_flag(strings, cutoff)
+
+
+def _american_flag(strings, cutoff):
+    """
+    Sort byte strings in place. Every bucket is partitioned by the byte at
+    `depth` with one counting pass and in-place swap cycles. Strings that end
+    at `depth` go to bucket 0 and are already in order.
+    Buckets are kept in an explicit stack instead of recursive calls.
+    """
+    stack = [(0, len(strings), 0)]
+    while stack:
+        lo, hi, depth = stack.pop()
+        if hi - lo <= cutoff:
+            _insertion_sort(strings, lo, hi)
+            continue
+        # skip the prefix shared by the whole bucket, the common prefix of
+        # the smallest and the largest string is shared by all of them.
+        # The bucket is read by index, it is never copied.
+        smallest = largest = strings[lo]
+        for i in xrange(lo + 1, hi):
+            string = strings[i]
+            if string < smallest:
+                smallest = string
+            elif string > largest:
+                largest = string
+        if smallest == largest:
+            continue
+        while depth < len(smallest) and smallest[depth] == largest[depth]:
+            depth += 1
+
+        counts = [0] * 257
+        for i in xrange(lo, hi):
+            string = strings[i]
+            counts[ord(string[depth]) + 1 if len(string) > depth else 0] += 1
+        # heads[b] is the next slot to fill in bucket b, ends[b] its end
+        heads, ends, total = [0] * 257, [0] * 257, lo
+        for b in xrange(257):
+            heads[b] = total
+            total += counts[b]
+            ends[b] = total
+        for b in xrange(257):
+            while heads[b] < ends[b]:
+                string = strings[heads[b]]
+                digit = ord(string[depth]) + 1 if len(string) > depth else 0
+                # move the string to its bucket until one belongs here
+                while digit != b:
+                    slot = heads[digit]
+                    strings[slot], string = string, strings[slot]
+                    heads[digit] = slot + 1
+                    digit = ord(string[depth]) + 1 if len(string) > depth else 0
+                strings[heads[b]] = string
+                heads[b] += 1
+        start = lo + counts[0]
+        for b in xrange(1, 257):
+            if counts[b] > 1:
+                stack.append((start, start + counts[b], depth + 1))
+            start += counts[b]
+
+
+def _insertion_sort(nums, lo, hi):
+    """
+    insertion_sort of 006_Sort.py on nums[lo:hi]. The slice is copied out and
+    back: it is never longer than `cutoff`, and indexing nums through a view
+    object made msd_radix_sort 2 to 3 times slower.
+    """
+    bucket = nums[lo:hi]
+    _sort_module.insertion_sort(bucket)
+    nums[lo:hi] = bucket
+
+
+def parallel_radix_sort(nums, radix_bits=8, workers=None):
+    """
+    radix_sort with the counting passes split across a multiprocessing pool.
+    Numbers should be non-negative and below 2^64. The numbers are copied
+    straight into the first of two shared-memory buffers, by one memmove for
+    an array.array, whose buffers have its typecode; in every pass each worker
+    counts the digits of its chunk, the parent turns the histograms into
+    per-worker offsets, and each worker scatters its chunk straight into the
+    other shared buffer. Only histograms and offsets are pickled.
+    : type nums: list or array.array('I'/'L'/'Q')
+    : type workers: int, the number of processes, None for cpu_count()
+    : rtype: None
+    """
+    from ctypes import c_uint64, memmove
+    from multiprocessing import Pool, cpu_count
+    from multiprocessing.sharedctypes import RawArray
+
+    length = len(nums)
+    if length < 2:
+        return
+    if min(nums) < 0 or max(nums) > _MASK64:
+        raise ValueError("Parallel radix sort only supports 64-bit unsigned integers!")
+    if radix_bits <= 0:
+        raise ValueError("radix_bits should be a positive integer!")
+    workers = min(workers or cpu_count(), length)
+    buckets = 1 << radix_bits
+    max_val = max(nums)
+    is_array = isinstance(nums, array)
+    typecode = nums.typecode if is_array else c_uint64
+    buffers = (RawArray(typecode, length), RawArray(typecode, length))
+    if is_array:
+        memmove(buffers[0], nums.buffer_info()[0], length * nums.itemsize)
+    else:
+        buffers[0][:] = nums
+    bounds = [length * i / workers for i in xrange(workers + 1)]
+    chunks = zip(bounds[:-1], bounds[1:])
+
+    if workers > 1:
+        pool = Pool(workers, _init_shared_buffers, buffers)
+        mapper = pool.map
+    else:
+        pool = None
+        _init_shared_buffers(*buffers)
+        mapper = map
+    try:
+        which, shift = 0, 0
+        while max_val >> shift:
+            histograms = mapper(_chunk_histogram,
+                [(which, lo, hi, shift, radix_bits) for lo, hi in chunks])
+            if any(sum(counts[digit] for counts in histograms) == length
+                   for digit in xrange(buckets)):
+                # all numbers share this digit, skip the pass
+                shift += radix_bits
+                continue
+            # global prefix sum: bucket by bucket, worker by worker, so that
+            # every worker writes its own stable slice of each bucket
+            total = 0
+            for digit in xrange(buckets):
+                for counts in histograms:
+                    counts[digit], total = total, total + counts[digit]
+            mapper(_chunk_scatter,
+                [(which, lo, hi, shift, radix_bits, heads)
+                 for (lo, hi), heads in izip(chunks, histograms)])
+            which = 1 - which
+            shift += radix_bits
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    if is_array:
+        memmove(nums.buffer_info()[0], buffers[which], length * nums.itemsize)
+    else:
+        nums[:] = buffers[which]
+
+
+# the shared buffers of parallel_radix_sort, set in every worker process
+_shared_buffers = ()
+
+def _init_shared_buffers(*buffers):
+    global _shared_buffers
+    _shared_buffers = buffers
+
+def _chunk_histogram(args):
+    which, lo, hi, shift, radix_bits = args
+    mask = (1 << radix_bits) - 1
+    counts = [0] * (1 << radix_bits)
+    for num in _shared_buffers[which][lo:hi]:
+        counts[(num >> shift) & mask] += 1
+    return counts
+
+def _chunk_scatter(args):
+    which, lo, hi, shift, radix_bits, heads = args
+    mask = (1 << radix_bits) - 1
+    dst = _shared_buffers[1 - which]
+    for num in _shared_buffers[which][lo:hi]:
+        digit = (num >> shift) & mask
+        dst[heads[digit]] = num
+        heads[digit] += 1
 
 
 def RadixSort_acc(unsorted, m=16, p=8):
     """
     : type unsorted: ListNode, header node
     : rtype: ListNode
+
+    The nodes are linked again in the order of their lowest `p` base-`m`
+    digits, val % m**p, stably, as the bucket lists of
+    _RadixSort_linkedlist did. The counting passes run by radix_sorted on
+    a list of the nodes, the values of the nodes are not changed.
+    """
+    nodes = []
+    terverse = unsorted.next
+    while terverse:
+        nodes.append(terverse)
+        terverse = terverse.next
+    if not nodes:
+        return None
+    modulus = m ** p
+    nodes = radix_sorted(nodes, key=lambda node: node.val % modulus)
+    for node, next_node in izip(nodes, nodes[1:]):
+        node.next = next_node
+    nodes[-1].next = None
+    return nodes[0]
+
+
+def _RadixSort_linkedlist(unsorted, m=16, p=8):
+    """
+    The original bucket-list implementation of RadixSort_acc.
+    : type unsorted: ListNode, header node
+    : rtype: ListNode
     """
     # initialize m linked lists in linkedlists array
     linkedlists = [ListNode(-1) for i in xrange(m)]
@@ -147,7 +585,195 @@ class ListNode(object):
         print tmp.val
 
 
+def radix_sort_test():
+    from random import randint, uniform, choice, shuffle
+    for radix_bits in (8, 11, 16):
+        for length in (0, 1, 2, 10, 100, 1000):
+            test = [randint(0, 2**32-1) for i in xrange(length)]
+            this = list(test)
+            radix_sort(this, radix_bits)
+            assert this == sorted(test)
+            this = array('I', test)
+            radix_sort(this, radix_bits)
+            assert this.tolist() == sorted(test)
+    # small numbers only need one pass
+    test = [randint(0, 255) for i in xrange(1000)]
+    this = list(test)
+    radix_sort(this, 16)
+    assert this == sorted(test)
+    # signed integers, floats and records
+    test = [randint(-2**40, 2**40) for i in xrange(1000)]
+    assert radix_sorted(test) == sorted(test)
+    test = [uniform(-1e6, 1e6) for i in xrange(1000)] + [0.0, -0.0, 1e-300, -1e-300]
+    assert radix_sorted(test, radix_bits=11) == sorted(test)
+    test = [(randint(-5, 5), i) for i in xrange(1000)]
+    calls = []
+    def record_key(record):
+        calls.append(record)
+        return record[0]
+    assert radix_sorted(test, key=record_key) == sorted(test)
+    assert len(calls) == len(test)
+    test = [(uniform(-5, 5), i) for i in xrange(1000)]
+    assert radix_sorted(test, key=lambda x: x[0]) == sorted(test)
+    # ints that are not exact doubles next to floats
+    for test in ([2**60+1, 2**60, 0.5], [2**53+1, 2**53, -2**53-1, -2**53, 1.5, 0],
+                 [10**400, -0.5, 10**400 - 1, -10**400]):
+        for i in xrange(3):
+            shuffle(test)
+            assert radix_sorted(test) == sorted(test)
+    test = [(2**60+1, 'a'), (0.5, 'b'), (2**60, 'c'), (0.5, 'd')]
+    assert radix_sorted(test, key=lambda x: x[0]) == sorted(test, key=lambda x: x[0])
+    # the process pool version
+    for workers in (1, 3):
+        for length in (0, 1, 2, 1000):
+            test = [randint(0, 2**64-1) for i in xrange(length)]
+            this = list(test)
+            parallel_radix_sort(this, 11, workers)
+            assert this == sorted(test)
+            test = [randint(0, 2**32-1) for i in xrange(length)]
+            this = array('I', test)
+            parallel_radix_sort(this, 11, workers)
+            assert this.tolist() == sorted(test)
+    # strings with shared prefixes and different lengths
+    for cutoff in (1, 32):
+        for length in (0, 1, 2, 100, 3000):
+            test = [''.join(choice('ab_') for j in xrange(randint(0, 8)))
+                    for i in xrange(length)]
+            this = list(test)
+            msd_radix_sort(this, cutoff)
+            assert this == sorted(test)
+            test = ['com.example.' + word for word in test] + ['com.example']
+            this = list(test)
+            msd_radix_sort(this, cutoff)
+            assert this == sorted(test)
+    test = [u'\u00e9t\u00e9', u'abc', u'\u4e2d', u'ab', u'\u00e9']
+    this = list(test)
+    msd_radix_sort(this, cutoff=1)
+    assert this == sorted(test) and all(type(x) is unicode for x in this)
+    test = ['caf\xc3\xa9', '\xff', 'x', 'caf']
+    this = list(test)
+    msd_radix_sort(this, cutoff=1)
+    assert this == sorted(test) and all(type(x) is str for x in this)
+    for test in (['caf\xc3\xa9', u'x'], ['a', 1]):
+        try:
+            msd_radix_sort(test)
+            assert False
+        except TypeError:
+            pass
+    # the buckets are partitioned in place, without copying them
+    class NoSlice(list):
+        def __getslice__(self, i, j):
+            raise AssertionError("bucket copied")
+    test = [''.join(choice('abc') for j in xrange(randint(0, 6))) for i in xrange(500)]
+    this = NoSlice(test)
+    msd_radix_sort(this, cutoff=1)
+    assert this == sorted(test)
+    # the linked-list adapter relinks the same nodes as the bucket lists do
+    def linked_nodes(node):
+        res = []
+        while node:
+            res.append(node)
+            node = node.next
+        return res
+    for m, p in ((16, 8), (10, 2), (2, 3)):
+        test = [randint(0, 10000) for i in xrange(200)]
+        head = ListNode.create_from_array(test)
+        nodes = linked_nodes(head.next)
+        final = linked_nodes(RadixSort_acc(head, m, p))
+        assert sorted(final, key=id) == sorted(nodes, key=id)
+        assert [node.val for node in nodes] == test
+        expected = _RadixSort_linkedlist(ListNode.create_from_array(test), m, p)
+        assert [node.val for node in final] == [node.val for node in linked_nodes(expected)]
+    assert [node.val for node in final] == sorted(test, key=lambda x: x % 8)
+    assert RadixSort_acc(ListNode(-1)) is None
+    print "radix_sort test passed!"
+
+
+def radix_benchmark(lengths=(1000, 10000, 100000, 1000000), radix_bits=(8, 11, 16),
+                    linkedlist_limit=10000):
+    """
+    Compare radix_sort with the linked-list RadixSort_acc and sorted().
+    The linked-list version is O(N^2) because of insert_last, it is only
+    timed up to `linkedlist_limit` numbers.
+    """
+    from random import randint
+    from time import time
+    for length in lengths:
+        test = [randint(0, 2**32-1) for i in xrange(length)]
+        stats = []
+        if length <= linkedlist_limit:
+            head = ListNode.create_from_array(test)
+            start = time()
+            _RadixSort_linkedlist(head, 16, 8)
+            stats.append(("RadixSort_acc(linked list)", time()-start))
+        for bits in radix_bits:
+            this = array('I', test)
+            start = time()
+            radix_sort(this, bits)
+            stats.append(("radix_sort(%d bits)" % bits, time()-start))
+        start = time()
+        sorted(test)
+        stats.append(("sorted", time()-start))
+        for name, cost_time in stats:
+            print "%8d %-28s %f" % (length, name, cost_time)
+
+
+def msd_benchmark(lengths=(10000, 100000, 1000000), cutoff=32):
+    """
+    Compare msd_radix_sort with sorted() and merge_sort of 006_Sort.py on
+    identifier-like strings: random names, and dotted names sharing prefixes.
+    """
+    from random import randint, choice
+    from time import time
+    chars = 'abcdefghijklmnopqrstuvwxyz_0123456789'
+    packages = ['com.example.%s.' % ''.join(choice(chars) for j in xrange(6))
+                for i in xrange(20)]
+    for length in lengths:
+        corpora = [
+            ("random", [''.join(choice(chars) for j in xrange(randint(4, 16)))
+                        for i in xrange(length)]),
+            ("prefixed", [choice(packages) + 'user_%d' % randint(0, length)
+                          for i in xrange(length)])]
+        for corpus_name, test in corpora:
+            for sort_name, my_sort in (("msd_radix_sort", lambda x: msd_radix_sort(x, cutoff)),
+                                       ("merge_sort", _sort_module.merge_sort),
+                                       ("sorted", lambda x: x.sort())):
+                this = list(test)
+                start = time()
+                my_sort(this)
+                print "%8d %-9s %-15s %f" % (length, corpus_name, sort_name, time()-start)
+
+
+def parallel_benchmark(length=1000000, max_workers=None, radix_bits=11):
+    """
+    Print the time and speedup of parallel_radix_sort for 1..max_workers
+    processes, compared with radix_sort in this process.
+    """
+    from multiprocessing import cpu_count
+    from random import randint
+    from time import time
+    test = [randint(0, 2**32-1) for i in xrange(length)]
+    this = array('I', test)
+    start = time()
+    radix_sort(this, radix_bits)
+    print "%8d radix_sort             %f" % (length, time()-start)
+    base = None
+    for workers in xrange(1, (max_workers or cpu_count()) + 1):
+        this = array('I', test)
+        start = time()
+        parallel_radix_sort(this, radix_bits, workers)
+        cost_time = time()-start
+        base = base or cost_time
+        print "%8d parallel(%2d workers)  %f  speedup %.2f" % (length, workers, cost_time, base/cost_time)
+
+
 if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
     head = ListNode.create_from_array([64,8,216,512,27,729,0,1,343,125,143,643,25,634,12,535,474])
     final = RadixSort_acc(head,16,8)
-    final.display_list()
\ No newline at end of file
+    final.display_list()
+    radix_sort_test()
+    # radix_benchmark()
+    # msd_benchmark()
+    # parallel_benchmark()
\ No newline at end of file
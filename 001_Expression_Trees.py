@@ -11,7 +11,84 @@
 # Construct: Store ans in stack
 #
 # Calculate: Use post-order traversal to calculate the result.
+#            The traversal keeps an explicit stack instead of recursive calls,
+#            so trees deeper than the recursion limit could be calculated.
 #
+# Parse:     parse reads infix text like '2 * (x - 1) ^ 3'. tokenize splits
+#            text (or an iterable of text chunks, like a file) into tokens
+#            as a generator, and infix_to_postfix is the shunting-yard
+#            algorithm: operands go to the output, operators wait in a stack
+#            until an operator of lower precedence comes. The postfix tokens
+#            are then built by construct. Every step is linear and
+#            non-recursive. '^' is right associative, unary '-' binds looser
+#            than '^' like Python, and is written as (0 - x).
+#
+# Incremental:
+#            IncrementalExpression caches the value of every node and links
+#            every node to its parents, in dicts of its own keyed by id(node),
+#            so several instances may share the nodes. Changing a variable
+#            marks its leaves' ancestors dirty, and only the dirty nodes are
+#            calculated again, O(depth) instead of O(n) when one leaf changes.
+#            With 10000 variables and one change per step, 1000 steps take
+#            28.546272 seconds with calculate and 0.049458 seconds
+#            incrementally.
+#
+#   operators            1000         10000        100000
+#   parse 'x + x ...'  0.014368     0.140332     1.795560
+#   calculate          0.002062     0.026460     0.310262
+#
+# Variables: Any string operand other than the operators is a variable leaf.
+#            Its value is looked up in the `variables` dict of calculate.
+#
+# Compile:   calculate walks the tree and compares the operator strings on
+#            every node, every time. compile turns the tree into a Python
+#            function once: one assignment per operator node in post-order,
+#            so evaluating the formula again is one function call. The code
+#            has no nested parentheses, so deep trees compile as well.
+#
+# Batch:     evaluate_batch evaluates the tree over whole columns of data, one
+#            node at a time instead of one row at a time. With NumPy arrays
+#            every node is one vector operation; with array.array or lists
+#            every node is one map() of the operator function over the
+#            columns, which still moves the loop out of Python code.
+#            1000000 rows of a depth 6 tree: calculate 107.924081 seconds,
+#            evaluate_batch over array('d') 7.057380 seconds, over NumPy
+#            arrays 0.130346 seconds.
+#
+# Sharing:   construct(share=True) hash-conses the nodes: a node with the same
+#            value and the same (shared) children is built only once, so
+#            repeated subexpressions become one node of a DAG. calculate_shared,
+#            evaluate_batch and compile calculate every shared node once.
+#
+# Simplify:  simplify folds constant subtrees and removes the operators of
+#            x+0, x-0, x*1, x/1 and x^1, and returns a smaller new tree.
+#            On constant_postfix(500): 1383 -> 489 nodes (191 folded, 256
+#            identities), 100 x calculate 0.138747 -> 0.051682 seconds.
+#
+#   repeated_postfix   nodes (tree -> DAG)   100 x calculate   100 x shared
+#   depth 4               125 ->   13           0.013301         0.003774
+#   depth 8              2045 ->   21           0.174249         0.005909
+#   depth 12            32765 ->   29           3.473728         0.009597
+#
+#   100 evaluations     depth 6      depth 10     depth 14
+#   calculate          0.010075     0.170788     3.418487
+#   compiled           0.000261     0.003775     0.064544
+#   compile once       0.002442     0.018173     0.311949
+#
+
+import operator
+import re
+from array import array
+from itertools import izip, repeat
+from keyword import iskeyword
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
 
 class BinaryTree(object):
     def __init__(self, content=-1):
@@ -32,12 +109,20 @@ class BinaryTree(object):
 
 class ExpressionTree(object):
     _operators = ['+', '-', '*', '/', '^', '%']
+    _py_operators = {'+': '+', '-': '-', '*': '*', '/': '/', '^': '**', '%': '%'}
+    _functions = {'+': operator.add, '-': operator.sub, '*': operator.mul,
+                  '/': operator.div, '^': operator.pow, '%': operator.mod}
+    # (constant, operator) pairs that give back the other operand
+    _right_identities = set([(0, '+'), (0, '-'), (1, '*'), (1, '/'), (1, '^')])
+    _left_identities = set([(0, '+'), (1, '*')])
 
     @classmethod
-    def construct(cls, in_list):
+    def construct(cls, in_list, share=False):
         """
         given in_list with operators and operands,
         automatically construct an Expression Tree and return its root.
+        If `share` is True, identical subtrees are built only once and
+        shared, so the result is a DAG.
         """
         if not in_list:
             return None
@@ -46,10 +131,15 @@ class ExpressionTree(object):
             return None
 
         operand_stack = Stack()
+        shared = {} if share else None
         for symbol in in_list:
-            if isinstance(symbol, (int, float)):
+            if isinstance(symbol, (int, long, float)):
                 # if it is an operands, push it into stack
-                new_node = BinaryTree(float(symbol))
+                new_node = cls._hash_cons(shared, BinaryTree(float(symbol)))
+                operand_stack.push(new_node)
+            elif isinstance(symbol, basestring) and symbol not in cls._operators:
+                # if it is a variable, push a variable leaf into stack
+                new_node = cls._hash_cons(shared, BinaryTree(symbol))
                 operand_stack.push(new_node)
             elif symbol in cls._operators:
                 # if it is an operator, pop 2 operands from stack
@@ -60,6 +150,7 @@ class ExpressionTree(object):
                 if first_operand and second_operand:
                     # first operand is the one popped later
                     new_node.left, new_node.right = second_operand, first_operand 
+                    new_node = cls._hash_cons(shared, new_node)
                     operand_stack.push(new_node)
                 else:
                     operand_stack.pop_all()
@@ -74,30 +165,488 @@ class ExpressionTree(object):
         return None
 
     @classmethod
-    def calculate(cls, in_tree):
-        def cal_node(tree):
-            if isinstance(tree.val, (int, float)):
-                return tree.val
+    def _hash_cons(cls, shared, node):
+        """
+        Return the node already built with the same value and children,
+        or `node` itself if it is the first one. Children are shared nodes,
+        so they are compared by id.
+        """
+        if shared is None:
+            return node
+        key = (repr(node.val), id(node.left), id(node.right))
+        return shared.setdefault(key, node)
+
+    @classmethod
+    def calculate(cls, in_tree, variables=None):
+        # post-order traversal with an explicit stack. An operator node pushes
+        # its function below its children, the function is applied when it
+        # is popped again. `values` keeps the operands waiting for it.
+        functions, numbers = cls._functions, (int, long, float)
+        values, stack = [], [in_tree]
+        while stack:
+            tree = stack.pop()
+            if not isinstance(tree, BinaryTree):
+                right = values.pop()
+                values[-1] = tree(values[-1], right)
+                continue
+            val = tree.val
+            if val not in functions:
+                values.append(val if isinstance(val, numbers) else variables[val])
+                continue
+            left, right = tree.left.val, tree.right.val
+            if left in functions or right in functions:
+                stack.append(functions[val])
+                stack.append(tree.right)
+                stack.append(tree.left)
+            else:
+                # both children are leaves, no need to push them
+                values.append(functions[val](
+                    left if isinstance(left, numbers) else variables[left],
+                    right if isinstance(right, numbers) else variables[right]))
+        return values.pop()
 
-            if tree.left:
-                left = cal_node(tree.left)
-            if tree.right:
-                right = cal_node(tree.right)
+    @classmethod
+    def parse(cls, text, share=False):
+        """
+        Construct an Expression Tree from infix text, or from an iterable of
+        text chunks.
+
+        >>> tree = ExpressionTree.parse('-2 ^ 2 + x * (3 - 1) % 5')
+        >>> ExpressionTree.calculate(tree, {'x': 4})
+        -1.0
+        >>> ExpressionTree.parse('(x)').val
+        'x'
+        """
+        postfix = list(infix_to_postfix(tokenize(text)))
+        if len(postfix) == 1:
+            # a single operand, construct only takes an operator at the end
+            symbol = postfix[0]
+            return BinaryTree(float(symbol) if isinstance(symbol, (int, long, float)) else symbol)
+        return cls.construct(postfix, share)
+
+    @classmethod
+    def calculate_shared(cls, in_tree, variables=None):
+        """
+        Same as calculate, but every shared node of a DAG built by
+        construct(share=True) is calculated only once.
+
+        >>> dag = ExpressionTree.construct(['x', 1, '+', 'x', 1, '+', '*'], share=True)
+        >>> ExpressionTree.calculate_shared(dag, {'x': 2})
+        9.0
+        """
+        values, stack = {}, [(in_tree, False)]
+        while stack:
+            tree, visited = stack.pop()
+            if id(tree) in values:
+                continue
+            if isinstance(tree.val, (int, long, float)):
+                values[id(tree)] = tree.val
+            elif tree.val not in cls._operators:
+                values[id(tree)] = variables[tree.val]
+            elif visited:
+                values[id(tree)] = cls._functions[tree.val](
+                    values[id(tree.left)], values[id(tree.right)])
+            else:
+                stack.append((tree, True))
+                stack.append((tree.right, False))
+                stack.append((tree.left, False))
+        return values[id(in_tree)]
+
+    @classmethod
+    def simplify(cls, in_tree, stats=None):
+        """
+        Return a new smaller tree: constant subtrees are folded into one
+        constant, and x+0, 0+x, x-0, x*1, 1*x, x/1, x^1 become x. Subtrees
+        whose folding raises (like 1/0) are kept. The input is not changed,
+        shared nodes stay shared. If `stats` is a dict, the counters
+        'folded', 'identities' and 'removed' are added to it.
+
+        >>> tree = ExpressionTree.construct(['x', 2, 3, '-', 1, '+', '+', 4, 4, '/', '*'])
+        >>> stats = {}
+        >>> ExpressionTree.simplify(tree, stats).val, stats['removed']
+        ('x', 10)
+        """
+        folded = identities = 0
+        new_nodes, stack = {}, [(in_tree, False)]
+        while stack:
+            tree, visited = stack.pop()
+            if id(tree) in new_nodes:
+                continue
+            if tree.val not in cls._operators:
+                new_nodes[id(tree)] = tree
+                continue
+            if not visited:
+                stack.append((tree, True))
+                stack.append((tree.right, False))
+                stack.append((tree.left, False))
+                continue
+            left, right = new_nodes[id(tree.left)], new_nodes[id(tree.right)]
+            left_const = isinstance(left.val, (int, long, float))
+            right_const = isinstance(right.val, (int, long, float))
+            new_node = None
+            if left_const and right_const:
+                try:
+                    new_node = BinaryTree(cls._functions[tree.val](left.val, right.val))
+                    folded += 1
+                except (ArithmeticError, ValueError):
+                    pass
+            elif right_const and (right.val, tree.val) in cls._right_identities:
+                new_node = left
+                identities += 1
+            elif left_const and (left.val, tree.val) in cls._left_identities:
+                new_node = right
+                identities += 1
+            if new_node is None:
+                if left is tree.left and right is tree.right:
+                    new_node = tree
+                else:
+                    new_node = BinaryTree(tree.val)
+                    new_node.left, new_node.right = left, right
+            new_nodes[id(tree)] = new_node
+        res = new_nodes[id(in_tree)]
+        if stats is not None:
+            stats['folded'] = stats.get('folded', 0) + folded
+            stats['identities'] = stats.get('identities', 0) + identities
+            stats['removed'] = stats.get('removed', 0) + \
+                cls.node_count(in_tree) - cls.node_count(res)
+        return res
+
+    @classmethod
+    def node_count(cls, in_tree, unique=True):
+        """
+        Return the number of distinct nodes if `unique`, otherwise the number
+        of nodes of the equivalent tree, where shared nodes count every time.
+
+        >>> dag = ExpressionTree.construct(['x', 1, '+', 'x', 1, '+', '*'], share=True)
+        >>> ExpressionTree.node_count(dag), ExpressionTree.node_count(dag, unique=False)
+        (4, 7)
+        """
+        sizes, stack = {}, [(in_tree, False)]
+        while stack:
+            tree, visited = stack.pop()
+            if id(tree) in sizes:
+                continue
+            if not (tree.left or tree.right):
+                sizes[id(tree)] = 1
+            elif visited:
+                sizes[id(tree)] = 1 + sizes[id(tree.left)] + sizes[id(tree.right)]
+            else:
+                stack.append((tree, True))
+                stack.append((tree.right, False))
+                stack.append((tree.left, False))
+        return len(sizes) if unique else sizes[id(in_tree)]
+
+    @classmethod
+    def evaluate_batch(cls, in_tree, columns):
+        """
+        Evaluate the tree for every row of `columns`, a dict from variable
+        name to a column of values. If any column is a NumPy array, NumPy
+        arrays are used and one is returned. Otherwise an array('d') is
+        returned.
+
+        >>> tree = ExpressionTree.construct(['x', 2, '*', 'y', '-'])
+        >>> ExpressionTree.evaluate_batch(tree, {'x': [1, 2, 3], 'y': array('d', [1, 1, 0])}).tolist()
+        [1.0, 3.0, 6.0]
+        """
+        lengths = set(len(column) for column in columns.itervalues())
+        if len(lengths) > 1:
+            raise ValueError("All columns should have the same length!")
+        length = lengths.pop() if lengths else 1
+        use_numpy = numpy is not None and \
+            any(isinstance(column, numpy.ndarray) for column in columns.itervalues())
+        if use_numpy:
+            columns = dict((name, numpy.asarray(column)) for name, column in columns.iteritems())
+
+        # iterative post-order traversal, shared nodes of a DAG are evaluated
+        # only once. Constants stay scalars.
+        values, stack = {}, [(in_tree, False)]
+        while stack:
+            tree, visited = stack.pop()
+            if id(tree) in values:
+                continue
+            if isinstance(tree.val, (int, long, float)):
+                values[id(tree)] = tree.val
+            elif tree.val not in cls._operators:
+                values[id(tree)] = columns[tree.val]
+            elif visited:
+                func = cls._functions[tree.val]
+                left, right = values[id(tree.left)], values[id(tree.right)]
+                left_scalar = isinstance(left, (int, long, float))
+                right_scalar = isinstance(right, (int, long, float))
+                if use_numpy or (left_scalar and right_scalar):
+                    values[id(tree)] = func(left, right)
+                else:
+                    values[id(tree)] = map(func, repeat(left, length) if left_scalar else left,
+                                           repeat(right, length) if right_scalar else right)
+            else:
+                stack.append((tree, True))
+                stack.append((tree.right, False))
+                stack.append((tree.left, False))
+        res = values[id(in_tree)]
+        if use_numpy:
+            return numpy.asarray(res, dtype=float) * numpy.ones(length)
+        if isinstance(res, (int, long, float)):
+            return array('d', repeat(res, length))
+        return array('d', res)
+
+    @classmethod
+    def variables(cls, in_tree):
+        """
+        Return the sorted names of the variables in the tree.
+        """
+        names, stack = set(), [in_tree]
+        while stack:
+            tree = stack.pop()
+            if tree.left or tree.right:
+                stack.append(tree.left)
+                stack.append(tree.right)
+            elif not isinstance(tree.val, (int, long, float)):
+                names.add(tree.val)
+        return sorted(names)
+
+    @classmethod
+    def compile(cls, in_tree, args=None):
+        """
+        Compile the tree into a Python function. The arguments of the function
+        are the variables, in the order of `args` or sorted by name.
+
+        >>> tree = ExpressionTree.construct(['x', 2, '*', 'y', '-'])
+        >>> func = ExpressionTree.compile(tree)
+        >>> func(3, 1), func(x=0.5, y=0)
+        (5.0, 1.0)
+        """
+        names = cls.variables(in_tree) if args is None else list(args)
+        for name in names:
+            if not _IDENTIFIER.match(name) or iskeyword(name):
+                raise ValueError("Variable %r can't be compiled!" % name)
+        # the temporaries and constants are named prefix + 't%d' or 'c%d',
+        # with a prefix that no variable starts with
+        prefix = '_'
+        while any(name.startswith(prefix) for name in names):
+            prefix += '_'
+        namespace, lines, temps = {}, [], {}
+
+        def operand(tree):
+            if isinstance(tree.val, (int, long, float)):
+                if tree.val - tree.val == 0:
+                    return repr(tree.val)
+                # inf and nan have no literal, pass them in as globals
+                const = '%sc%d' % (prefix, len(namespace))
+                namespace[const] = tree.val
+                return const
+            if tree.val in cls._operators:
+                return temps[id(tree)]
+            return tree.val
+
+        # iterative post-order traversal, one assignment per operator node
+        stack = [(in_tree, False)]
+        while stack:
+            tree, visited = stack.pop()
+            if tree.val not in cls._operators or id(tree) in temps:
+                # leaves are inlined, shared nodes are assigned only once
+                continue
+            if visited:
+                temp = '%st%d' % (prefix, len(temps))
+                lines.append('    %s = %s %s %s' % (temp, operand(tree.left),
+                             cls._py_operators[tree.val], operand(tree.right)))
+                temps[id(tree)] = temp
+            else:
+                stack.append((tree, True))
+                stack.append((tree.right, False))
+                stack.append((tree.left, False))
+        lines.append('    return %s' % operand(in_tree))
+        source = 'def _expression(%s):\n%s\n' % (', '.join(names), '\n'.join(lines))
+        exec compile(source, '<expression>', 'exec') in namespace
+        return namespace['_expression']
+
+
+class IncrementalExpression(object):
+    """
+    Keep the value of every node of an expression tree (or DAG), so that
+    changing one variable only calculates the nodes above its leaves again.
+    The state belongs to the instance and is keyed by id(node), so several
+    instances may share the nodes: `_cache` is the value of every node,
+    `_dirty` holds the nodes out of date, and `_parents` links to the parents.
+
+    >>> tree = ExpressionTree.parse('(a + b) * (c - d)')
+    >>> expr = IncrementalExpression(tree, {'a': 1, 'b': 2, 'c': 5, 'd': 1})
+    >>> expr.value()
+    12
+    >>> expr.set('d', 3)
+    >>> expr.value()
+    6
+    """
+    def __init__(self, in_tree, variables):
+        self._root = in_tree
+        self._variables = dict(variables)
+        self._leaves = {}
+        self._cache, self._dirty, self._parents = {}, set(), {}
+        cache, parents = self._cache, self._parents
+        functions = ExpressionTree._functions
+        # post-order traversal to link the parents and fill the caches
+        stack = [(in_tree, False)]
+        while stack:
+            tree, visited = stack.pop()
+            if visited:
+                cache[id(tree)] = functions[tree.val](cache[id(tree.left)], cache[id(tree.right)])
+                parents[id(tree.left)].append(tree)
+                parents[id(tree.right)].append(tree)
+                continue
+            if id(tree) in parents:
+                continue
+            parents[id(tree)] = []
+            if isinstance(tree.val, (int, long, float)):
+                cache[id(tree)] = tree.val
+            elif tree.val not in functions:
+                cache[id(tree)] = self._variables[tree.val]
+                self._leaves.setdefault(tree.val, []).append(tree)
+            else:
+                stack.append((tree, True))
+                stack.append((tree.right, False))
+                stack.append((tree.left, False))
 
-            if tree.val == '+':
-                return left + right
-            elif tree.val == '-':
-                return left - right
-            elif tree.val == '*':
-                return left * right
-            elif tree.val == '/':
-                return left / right
-            elif tree.val == '^':
-                return left ** right
-            elif tree.val == '%':
-                return left % right
+    def set(self, name, value):
+        """
+        Change the value of a variable, O(depth) for a tree.
+        """
+        self._variables[name] = value
+        dirty, parents = self._dirty, self._parents
+        for leaf in self._leaves.get(name, ()):
+            self._cache[id(leaf)] = value
+            # mark the ancestors dirty, stop at the ones already dirty
+            stack = list(parents[id(leaf)])
+            while stack:
+                tree = stack.pop()
+                if id(tree) not in dirty:
+                    dirty.add(id(tree))
+                    stack.extend(parents[id(tree)])
+
+    def value(self):
+        """
+        Return the value of the expression, calculating the dirty nodes only.
+        """
+        functions = ExpressionTree._functions
+        cache, dirty = self._cache, self._dirty
+        stack = [(self._root, False)] if id(self._root) in dirty else []
+        while stack:
+            tree, visited = stack.pop()
+            if visited:
+                cache[id(tree)] = functions[tree.val](cache[id(tree.left)], cache[id(tree.right)])
+                dirty.discard(id(tree))
+            elif id(tree) in dirty:
+                stack.append((tree, True))
+                for child in (tree.right, tree.left):
+                    if id(child) in dirty:
+                        stack.append((child, False))
+        return cache[id(self._root)]
+
+
+_TOKEN = re.compile(r'\s*(?:((?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)|([A-Za-z_]\w*)|(\S))')
+# characters that end a token, '+' and '-' may be in the exponent of a number
+_SEPARATOR = re.compile(r'[\s()*/^%]|(?<![eE])[-+]')
+# precedence of the operators, unary minus is 'u-'
+_PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2, '%': 2, 'u-': 3, '^': 4}
+
+
+def tokenize(text):
+    """
+    Generator of the tokens of infix text: numbers as int or float,
+    variables, operators and parentheses as str. `text` could be a str or an
+    iterable of str chunks, a token may span two chunks.
+
+    >>> list(tokenize(['x1*(2.5e', '3-.5)']))
+    ['x1', '*', '(', 2500.0, '-', 0.5, ')']
+    """
+    if isinstance(text, basestring):
+        text = [text]
+    rest = ''
+    for chunk in text:
+        rest += chunk
+        # the last token may go on in the next chunk, so only the text up to
+        # the last character that can't be inside a token is split now
+        cut = 0
+        for match in _SEPARATOR.finditer(rest):
+            cut = match.end()
+        for match in _TOKEN.finditer(rest, 0, cut):
+            for token in _to_tokens(match):
+                yield token
+        rest = rest[cut:]
+    for match in _TOKEN.finditer(rest):
+        for token in _to_tokens(match):
+            yield token
+
+
+def _to_tokens(match):
+    number, name, symbol = match.groups()
+    if number:
+        yield float(number) if set('.eE') & set(number) else int(number)
+    elif name:
+        yield name
+    elif symbol:
+        if symbol not in _PRECEDENCE and symbol not in '()':
+            raise ValueError("Unknown symbol %r in expression!" % symbol)
+        yield symbol
+
+
+def infix_to_postfix(tokens):
+    """
+    Shunting-yard algorithm, generator of the postfix tokens. Raise
+    ValueError if an operand or an operator is missing or misplaced.
+
+    >>> list(infix_to_postfix(tokenize('1 - 2 ^ 3 ^ 4 * -x')))
+    [1, 2, 3, 4, '^', '^', 0.0, 'x', '-', '*', '-']
+    """
+    operators = []
+    # whether the next token should be an operand
+    expect_operand = True
+    for token in tokens:
+        if not isinstance(token, basestring) or token not in _PRECEDENCE and token not in '()':
+            # number or variable
+            if not expect_operand:
+                raise ValueError("Operand %r misses an operator before it!" % (token,))
+            yield token
+            expect_operand = False
+        elif token == '(':
+            if not expect_operand:
+                raise ValueError("'(' misses an operator before it!")
+            operators.append(token)
+            expect_operand = True
+        elif token == ')':
+            if expect_operand:
+                raise ValueError("Operand missing before ')'!")
+            while operators and operators[-1] != '(':
+                yield _pop_operator(operators)
+            if not operators:
+                raise ValueError("Unbalanced parentheses in expression!")
+            operators.pop()
+            expect_operand = False
+        elif expect_operand:
+            # unary operator, it has no left operand so it pops nothing
+            if token == '-':
+                yield 0.0
+                operators.append('u-')
+            elif token != '+':
+                raise ValueError("Operator %r misses its left operand!" % token)
+        else:
+            precedence = _PRECEDENCE[token]
+            while operators and operators[-1] != '(':
+                top = _PRECEDENCE[operators[-1]]
+                if top < precedence or (top == precedence and token == '^'):
+                    break
+                yield _pop_operator(operators)
+            operators.append(token)
+            expect_operand = True
+    if expect_operand:
+        raise ValueError("Expression misses its last operand!")
+    while operators:
+        if operators[-1] == '(':
+            raise ValueError("Unbalanced parentheses in expression!")
+        yield _pop_operator(operators)
 
-        return cal_node(in_tree)
+
+def _pop_operator(operators):
+    operator = operators.pop()
+    return '-' if operator == 'u-' else operator
 
 
 class Stack(object):
@@ -162,6 +711,314 @@ class ListNode(object):
         print tmp.val
 
 
+def expression_test():
+    from random import choice, randint, uniform
+    express = ExpressionTree.construct([1,2,'-',3,4,5,'/','^','%'])
+    assert ExpressionTree.compile(express)() == ExpressionTree.calculate(express)
+    express = ExpressionTree.construct(['x', 'y', '^', 'x', 2, '%', '-', 'inf', '+'])
+    assert ExpressionTree.variables(express) == ['inf', 'x', 'y']
+    func = ExpressionTree.compile(express)
+    assert func(1, 3.0, 2.0) == ExpressionTree.calculate(express, {'x': 3.0, 'y': 2.0, 'inf': 1})
+    express = ExpressionTree.construct([float('inf'), 'x', '*'])
+    assert ExpressionTree.compile(express)(-1) == float('-inf')
+    # variables with the names of the temporaries and constants
+    for postfix, variables in [(['_t0', 1, '+', '_t0', '*'], {'_t0': 2}),
+                               (['_c0', float('inf'), '+'], {'_c0': 1}),
+                               (['_', '__c0', float('inf'), '-', '*', '__t1', '+'],
+                                {'_': 2, '__c0': 3, '__t1': 5})]:
+        express = ExpressionTree.construct(postfix)
+        res = ExpressionTree.calculate(express, variables)
+        assert ExpressionTree.compile(express)(**variables) == res
+    # random expressions with variables
+    for i in xrange(200):
+        postfix = [choice('abc')]
+        for j in xrange(randint(1, 30)):
+            postfix += [choice(['a', 'b', 'c', uniform(1, 2)]), choice('+-*')]
+        express = ExpressionTree.construct(postfix)
+        variables = {'a': uniform(-2, 2), 'b': uniform(-2, 2), 'c': uniform(-2, 2)}
+        func = ExpressionTree.compile(express, ['a', 'b', 'c'])
+        assert func(**variables) == ExpressionTree.calculate(express, variables)
+    # column-wise evaluation
+    express = ExpressionTree.construct(['a', 'b', '*', 'c', 1.5, '^', '-', 'a', 'c', '%', '+'])
+    columns = {'a': [uniform(-2, 2) for i in xrange(100)],
+               'b': array('d', [uniform(-2, 2) for i in xrange(100)]),
+               'c': array('i', [randint(1, 5) for i in xrange(100)])}
+    res = ExpressionTree.evaluate_batch(express, columns)
+    for i in xrange(100):
+        row = dict((name, column[i]) for name, column in columns.iteritems())
+        assert res[i] == ExpressionTree.calculate(express, row)
+    if numpy is not None:
+        numpy_columns = dict((name, numpy.array(column)) for name, column in columns.iteritems())
+        numpy_res = ExpressionTree.evaluate_batch(express, numpy_columns)
+        assert isinstance(numpy_res, numpy.ndarray) and numpy.allclose(numpy_res, res)
+        numpy_columns['a'] = columns['a']
+        assert numpy.allclose(ExpressionTree.evaluate_batch(express, numpy_columns), res)
+    express = ExpressionTree.construct([1, 2, '+'])
+    assert ExpressionTree.evaluate_batch(express, {'x': [0] * 5}).tolist() == [3.0] * 5
+    if numpy is not None:
+        res = ExpressionTree.evaluate_batch(express, {'x': numpy.zeros(5)})
+        assert isinstance(res, numpy.ndarray) and res.tolist() == [3.0] * 5
+    # shared subexpressions
+    for depth in (1, 4, 8):
+        postfix = repeated_postfix(depth)
+        express = ExpressionTree.construct(postfix)
+        dag = ExpressionTree.construct(postfix, share=True)
+        assert ExpressionTree.node_count(dag) < ExpressionTree.node_count(express)
+        assert ExpressionTree.node_count(dag, False) == ExpressionTree.node_count(express)
+        variables = {'x': uniform(-1, 1), 'y': uniform(-1, 1)}
+        res = ExpressionTree.calculate(express, variables)
+        assert ExpressionTree.calculate_shared(dag, variables) == res
+        assert ExpressionTree.calculate(dag, variables) == res
+        assert ExpressionTree.compile(dag)(**variables) == res
+        assert ExpressionTree.evaluate_batch(dag, {'x': [variables['x']], 'y': [variables['y']]})[0] == res
+    # constant folding and identities
+    for i in xrange(200):
+        postfix = constant_postfix(randint(1, 40))
+        express = ExpressionTree.construct(postfix)
+        stats = {}
+        simple = ExpressionTree.simplify(express, stats)
+        assert ExpressionTree.node_count(simple) == ExpressionTree.node_count(express) - stats['removed']
+        variables = {'x': uniform(-2, 2), 'y': uniform(-2, 2)}
+        try:
+            res = ExpressionTree.calculate(express, variables)
+        except (ArithmeticError, ValueError):
+            continue
+        assert abs(ExpressionTree.calculate(simple, variables) - res) <= 1e-9 * max(1, abs(res))
+    express = ExpressionTree.construct([1, 0, '/', 'x', '+'])
+    assert ExpressionTree.simplify(express) is express
+    # infix text, compared with Python
+    for text in ['1 - 2 * (3 + x) ^ 2 ^ 0.5 % 7 / -x', '-x ^ 2', '2 ^ -x', '+x - -x',
+                 '((x)) + 1', 'x * 1e2 % 3.5 - .25', '2 ^ 3 ^ 2 / x / 3 - 1 - 1']:
+        express = ExpressionTree.parse(text)
+        res = eval(text.replace('^', '**'), {'x': 1.5})
+        assert abs(ExpressionTree.calculate(express, {'x': 1.5}) - res) < 1e-9
+    for text, res in [('x', 1.5), ('2', 2.0), ('(x)', 1.5), ('((-2))', -2.0)]:
+        assert ExpressionTree.calculate(ExpressionTree.parse(text), {'x': 1.5}) == res
+    for text in ['(1 + 2', '1 + 2)', '* 3', '1 + $', '1 2 +', '1 2', '1 +', 'x y',
+                 '', '()', '(1 +)', '2 (3)', '-']:
+        try:
+            ExpressionTree.parse(text)
+            assert False
+        except ValueError:
+            pass
+    # very deep expressions, far beyond the recursion limit
+    express = ExpressionTree.parse(['1 +'] * 50000 + ['x'])
+    assert ExpressionTree.calculate(express, {'x': 1}) == 50001
+    express = ExpressionTree.parse('(' * 30000 + 'x' + ' ^ 1)' * 30000)
+    assert ExpressionTree.calculate(express, {'x': 2}) == 2
+    express = ExpressionTree.parse('1 ^ ' * 30000 + 'x')
+    assert ExpressionTree.calculate(express, {'x': 2}) == 1
+    assert ExpressionTree.compile(express)(2) == 1
+    # incremental calculation after changing one variable
+    names = ['v%d' % i for i in xrange(50)]
+    for share in (False, True):
+        express = ExpressionTree.construct(random_postfix(names, 300), share)
+        variables = dict((name, uniform(1, 2)) for name in names)
+        expr = IncrementalExpression(express, variables)
+        assert expr.value() == ExpressionTree.calculate(express, variables)
+        for i in xrange(100):
+            name = choice(names)
+            variables[name] = uniform(1, 2)
+            expr.set(name, variables[name])
+            if i % 3 == 0:
+                assert expr.value() == ExpressionTree.calculate(express, variables)
+    # two instances over the same nodes keep their own values
+    express = ExpressionTree.construct(['x', 1, '+', 2, 0, '+', '*'])
+    first = IncrementalExpression(express, {'x': 1})
+    second = IncrementalExpression(ExpressionTree.simplify(express), {'x': 1})
+    third = IncrementalExpression(express, {'x': 1})
+    first.set('x', 5)
+    assert first.value() == 12 and second.value() == 4 and third.value() == 4
+    second.set('x', 2)
+    assert second.value() == 6 and first.value() == 12 and third.value() == 4
+    print "expression test passed!"
+
+
+def deep_postfix(depth):
+    """
+    A balanced expression of variables x and y with 2^depth leaves.
+    """
+    postfix = ['x']
+    for i in xrange(depth):
+        postfix = postfix + ['y' if i & 1 else 'x'] + postfix[1:] + ['+-*'[i%3]]
+    return postfix
+
+
+def repeated_postfix(depth):
+    """
+    An expression whose both operands repeat the same subexpression:
+    E(0) = x*y+1, E(i) = (E(i-1) op E(i-1)) op x
+    """
+    postfix = ['x', 'y', '*', 1, '+']
+    for i in xrange(depth):
+        postfix = postfix + postfix + ['+*-'[i%3], 'x', '+-'[i&1]]
+    return postfix
+
+
+def share_benchmark(depths=(4, 8, 12), times=100):
+    """
+    Compare node counts and evaluation time of the tree and the DAG.
+    """
+    from time import time
+    for depth in depths:
+        postfix = repeated_postfix(depth)
+        express = ExpressionTree.construct(postfix)
+        dag = ExpressionTree.construct(postfix, share=True)
+        variables = {'x': 0.5, 'y': 0.25}
+        start = time()
+        for i in xrange(times):
+            ExpressionTree.calculate(express, variables)
+        tree_time = time()-start
+        start = time()
+        for i in xrange(times):
+            ExpressionTree.calculate_shared(dag, variables)
+        dag_time = time()-start
+        print "depth %2d nodes %6d -> %4d  calculate %f  calculate_shared %f" % (
+            depth, ExpressionTree.node_count(express), ExpressionTree.node_count(dag),
+            tree_time, dag_time)
+
+
+def constant_postfix(length):
+    """
+    A random expression of x, y, constants and identities like x*1 and x+0.
+    """
+    from random import choice, randint
+    postfix = [choice(['x', 'y', randint(1, 9)])]
+    for i in xrange(length):
+        operand, operators = choice([(['x'], '+-*'), (['y'], '+-*'), ([randint(1, 9)], '+-*/'),
+                                     ([randint(1, 9), randint(1, 9), '*'], '+-*/'),
+                                     ([1], '*/^'), ([2, 1, '-'], '*/^'), ([0], '+-'), ([3, 3, '-'], '+-')])
+        postfix += operand + [choice(operators)]
+    return postfix
+
+
+def simplify_benchmark(length=500, times=100):
+    """
+    Compare calculate on the generated tree and on the simplified tree.
+    """
+    from time import time
+    express = ExpressionTree.construct(constant_postfix(length))
+    stats = {}
+    simple = ExpressionTree.simplify(express, stats)
+    variables = {'x': 1.5, 'y': 2.5}
+    start = time()
+    for i in xrange(times):
+        ExpressionTree.calculate(express, variables)
+    before = time()-start
+    start = time()
+    for i in xrange(times):
+        ExpressionTree.calculate(simple, variables)
+    after = time()-start
+    print "nodes %d -> %d, folded %d, identities %d" % (ExpressionTree.node_count(express),
+        ExpressionTree.node_count(simple), stats['folded'], stats['identities'])
+    print "calculate %f -> %f" % (before, after)
+
+
+def random_postfix(names, length):
+    """
+    A random expression of `length` operators over the variables `names`,
+    built by joining random pairs of subexpressions, so it is about log deep.
+    """
+    from random import choice, randrange
+    parts = [[choice(names)] for i in xrange(length + 1)]
+    while len(parts) > 1:
+        i = randrange(len(parts) - 1)
+        parts[i:i+2] = [parts[i] + parts[i+1] + [choice('+-*')]]
+    return parts[0]
+
+
+def incremental_benchmark(variable_num=10000, steps=1000):
+    """
+    Change one variable per step, compare calculate of the whole tree
+    with IncrementalExpression.
+    """
+    from random import choice, uniform
+    from time import time
+    names = ['v%d' % i for i in xrange(variable_num)]
+    express = ExpressionTree.construct(random_postfix(names, variable_num - 1))
+    variables = dict((name, uniform(0.5, 1.5)) for name in names)
+    changes = [(choice(names), uniform(0.5, 1.5)) for i in xrange(steps)]
+    start = time()
+    for name, value in changes:
+        variables[name] = value
+        ExpressionTree.calculate(express, variables)
+    print "%d steps calculate    %f" % (steps, time()-start)
+    expr = IncrementalExpression(express, variables)
+    start = time()
+    for name, value in changes:
+        expr.set(name, value)
+        expr.value()
+    print "%d steps incremental  %f" % (steps, time()-start)
+
+
+def compile_benchmark(depths=(6, 10, 14), times=1000):
+    """
+    Time `times` evaluations of calculate and of the compiled function.
+    """
+    from time import time
+    for depth in depths:
+        express = ExpressionTree.construct(deep_postfix(depth))
+        start = time()
+        func = ExpressionTree.compile(express)
+        compile_time = time()-start
+        start = time()
+        for i in xrange(times):
+            ExpressionTree.calculate(express, {'x': 1.0001, 'y': i})
+        calculate_time = time()-start
+        start = time()
+        for i in xrange(times):
+            func(1.0001, i)
+        compiled_time = time()-start
+        print "depth %2d calculate %f compiled %f (compile %f)" % (depth, calculate_time, compiled_time, compile_time)
+
+
+def batch_benchmark(length=1000000, depth=6):
+    """
+    Time calculate row by row against evaluate_batch over columns.
+    """
+    from random import uniform
+    from time import time
+    express = ExpressionTree.construct(deep_postfix(depth))
+    columns = {'x': array('d', [uniform(0.99, 1.01) for i in xrange(length)]),
+               'y': array('d', [uniform(-1, 1) for i in xrange(length)])}
+    start = time()
+    for x, y in izip(columns['x'], columns['y']):
+        ExpressionTree.calculate(express, {'x': x, 'y': y})
+    print "%d rows calculate      %f" % (length, time()-start)
+    start = time()
+    ExpressionTree.evaluate_batch(express, columns)
+    print "%d rows evaluate_batch %f" % (length, time()-start)
+    if numpy is not None:
+        columns = dict((name, numpy.array(column)) for name, column in columns.iteritems())
+        start = time()
+        ExpressionTree.evaluate_batch(express, columns)
+        print "%d rows numpy batch    %f" % (length, time()-start)
+
+
+def parse_benchmark(lengths=(1000, 10000, 100000)):
+    """
+    Parse and calculate sums and right-nested powers of growing length.
+    """
+    from time import time
+    for length in lengths:
+        for text in ('x + ' * length + 'x', '(x ^ ' * length + 'x' + ')' * length):
+            start = time()
+            express = ExpressionTree.parse(text)
+            parse_time = time()-start
+            start = time()
+            ExpressionTree.calculate(express, {'x': 1})
+            print "%7d operators  parse %f  calculate %f" % (length, parse_time, time()-start)
+
+
 if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
     express = ExpressionTree.construct([1,2,'-',3,4,5,'/','^','%'])
-    print ExpressionTree.calculate(express)
\ No newline at end of file
+    print ExpressionTree.calculate(express)
+    expression_test()
+    # compile_benchmark()
+    # batch_benchmark()
+    # share_benchmark()
+    # simplify_benchmark()
+    # parse_benchmark()
+    # incremental_benchmark()
\ No newline at end of file
@@ -3,6 +3,71 @@
 # Keypoint: After insertion, roatate the tree if AVL-condition is not reached.
 #           Every node keep updated with the height information.
 #
+# Deletion: Replace the deleted node with the smallest node of its right subtree,
+#           then rotate every node on the way back to the root if AVL-condition
+#           is not reached, same as insertion.
+#
+# Join & Split:
+#           join(left, key, right) links two AVL trees where left <= key <= right.
+#           If one tree is more than 1 higher, walk down the spine of the higher
+#           tree until the heights match, link there and rotate on the way back,
+#           O(height difference). split(key) cuts a tree into items < key and
+#           items >= key by joining the pieces along one path, O(logN).
+#           union, intersection and difference split the second tree by the
+#           root of the first, recurse on both halves and join the results, it
+#           takes O(mlog(n/m + 1)) for trees of size m <= n, instead of m
+#           inserts or deletes with their rotations.
+#           insert_many builds a balanced tree from its sorted batch in O(m) and
+#           merges it in the same way, keeping duplicates like insert.
+#           These operations reuse the nodes of their input trees, the input
+#           trees should not be used after the call.
+#
+#           bulk_benchmark, adding a batch of random floats into a tree of 100000:
+#               batch       repeated insert     insert_many     union
+#               100         0.006523            0.006872        0.010238
+#               10000       0.475842            0.368156        0.220421
+#               100000      4.286320            2.216805        1.274042
+#           insert_many includes sorting the batch and building its tree.
+#
+# Range Scan:
+#           iter_range is range_walk of 002_Binary_Search_Tree.py. The height
+#           of an AVL tree is below 1.44*log2(N+2), so its stack of one path stays
+#           O(logN) for any order of insertion. PersistentAVL walks the root of
+#           its version with the same function.
+#
+# Persistent AVL:
+#           PersistentAVL never changes a node after it is built. insert and
+#           delete copy the nodes on the path from the root to the changed node,
+#           and rebalance by building new nodes, so they make O(logN) new nodes
+#           and share all other nodes with the old version. Then snapshot() just
+#           keeps the current root, O(1). A reader iterates its snapshot without
+#           any lock while a writer goes on, because publishing a new version is
+#           one assignment of the root.
+#
+#           persistent_benchmark, 100000 random floats:
+#               nodes per version   16.5 (88 bytes per node, 1454 bytes per version)
+#               a full copy         100000 nodes per version
+#               read throughput     1208181 items/s alone
+#                                   547870 items/s with a writer thread, which
+#                                   inserted 7839 items/s at the same time
+#           The threads share one interpreter lock, so the reader gets about
+#           half of the time, but it never waits for the writer to finish.
+#
+# Order Statistic:
+#           rank, select and count_range work as in 002, by `_size` of the
+#           subtrees. Here the sizes also have to follow the rotations:
+#           singleRotate and doubleRotate recompute `_size` of the nodes they
+#           move, bottom-up, in the same place as the height. The balance
+#           keeps every query O(logN).
+#
+
+import imp
+import os
+import threading
+
+_bst_module = imp.load_source('binary_search_tree',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '002_Binary_Search_Tree.py'))
+
 
 class BinaryTree(object):
     def __init__(self, content=-1):
@@ -26,9 +91,11 @@ class BinaryTree(object):
         # call the recursive function
         print_tree(self, 0)
 
+
 class AVL(BinaryTree):
     def __init__(self, content="EmptyNode"):
         self._height = 0
+        self._size = 0 if content == "EmptyNode" else 1
         super(AVL,self).__init__(content)
 
     @classmethod
@@ -47,9 +114,17 @@ class AVL(BinaryTree):
         else:
             return -1
 
+    @classmethod
+    def getSize(cls, node):
+        if isinstance(node, cls):
+            return node._size
+        else:
+            return 0
+
     def makeEmpty(self):
-        self.value = 'EmptyNode'
+        self.val = 'EmptyNode'
         self._height = 0
+        self._size = 0
         self.left = None
         self.right = None
 
@@ -116,6 +191,8 @@ class AVL(BinaryTree):
 
         k1._height = max(AVL.getHeight(k1.left), AVL.getHeight(k1.right)) + 1
         k2._height = max(AVL.getHeight(k2.left), AVL.getHeight(k2.right)) + 1
+        k1._size = AVL.getSize(k1.left) + AVL.getSize(k1.right) + 1
+        k2._size = AVL.getSize(k2.left) + AVL.getSize(k2.right) + 1
         return k2
 
     def doubleRotate(self, flag):
@@ -136,6 +213,9 @@ class AVL(BinaryTree):
         k1._height = max(AVL.getHeight(k1.left), AVL.getHeight(k1.right)) + 1
         k2._height = max(AVL.getHeight(k2.left), AVL.getHeight(k2.right)) + 1
         k3._height = max(AVL.getHeight(k3.left), AVL.getHeight(k3.right)) + 1
+        k1._size = AVL.getSize(k1.left) + AVL.getSize(k1.right) + 1
+        k2._size = AVL.getSize(k2.left) + AVL.getSize(k2.right) + 1
+        k3._size = AVL.getSize(k3.left) + AVL.getSize(k3.right) + 1
         return k3
 
     def insert(self, content):
@@ -154,6 +234,7 @@ class AVL(BinaryTree):
         # When input_tree is an empty tree
         if self.val == "EmptyNode":
             self.val = content
+            self._size = 1
             return self
         # Left subtree operation
         elif content < self.val:
@@ -186,23 +267,292 @@ class AVL(BinaryTree):
             # Keep searching through right subtree
         # Operation on height
         self._height = max(AVL.getHeight(self.left), AVL.getHeight(self.right)) + 1
+        self._size = AVL.getSize(self.left) + AVL.getSize(self.right) + 1
+        return self
+
+    def iter_range(self, lo=None, hi=None, reverse=False):
+        """
+        Generator of the items in [lo, hi) in sorted order, or in reversed
+        order if `reverse`. None means no bound. The first item is found in
+        one walk from the root, and the stack only keeps one path.
+
+        >>> tree = AVL.createFromList([5, 1, 4, 4, 9, 7])
+        >>> list(tree.iter_range(4, 9)), list(tree.iter_range(hi=5, reverse=True))
+        ([4, 4, 5, 7], [4, 4, 1])
+        """
+        if self.val == "EmptyNode":
+            return iter(())
+        return _bst_module.range_walk(self, lo, hi, reverse)
+
+    def _rebalance(self):
+        """
+        Rotate this node if AVL-condition is not reached after deletion,
+        and update its height and size. Return the new root of this subtree.
+        """
+        if AVL.getHeight(self.left) - AVL.getHeight(self.right) == 2:
+            if AVL.getHeight(self.left.left) >= AVL.getHeight(self.left.right):
+                self = self.singleRotate(0)
+            else:
+                self = self.doubleRotate(0)
+        elif AVL.getHeight(self.right) - AVL.getHeight(self.left) == 2:
+            if AVL.getHeight(self.right.right) >= AVL.getHeight(self.right.left):
+                self = self.singleRotate(1)
+            else:
+                self = self.doubleRotate(1)
+        self._height = max(AVL.getHeight(self.left), AVL.getHeight(self.right)) + 1
+        self._size = AVL.getSize(self.left) + AVL.getSize(self.right) + 1
         return self
 
-    def _deleteMin(self, p_node):
+    def _deleteMin(self):
+        """
+        this method is to support delete method.
+        Return the subtree without its min node, and the min value.
+        """
+        if not self.left:
+            return self.right, self.val
+        self.left, min_val = self.left._deleteMin()
+        return self._rebalance(), min_val
+
+    @classmethod
+    def join(cls, left, key, right):
+        """
+        Return the tree of all items of left, key and all items of right.
+        Items of left should be <= key, and items of right should be >= key.
+
+        >>> avl = AVL.join(AVL.createFromList([1, 2]), 3, AVL.createFromList(range(4, 20)))
+        >>> list(avl.iter_range()) == range(1, 20)
+        True
+        """
+        return cls._wrap(cls._join(cls._unwrap(left), cls(key), cls._unwrap(right)))
+
+    def split(self, key):
+        """
+        Return two trees, of the items < key and of the items >= key.
+
+        >>> small, large = AVL.createFromList(range(10)).split(4)
+        >>> list(small.iter_range()), list(large.iter_range())
+        ([0, 1, 2, 3], [4, 5, 6, 7, 8, 9])
+        """
+        small, large = AVL._split(AVL._unwrap(self), key)
+        return AVL._wrap(small), AVL._wrap(large)
+
+    def union(self, other):
+        """
+        Return the tree of the items in self or in other, an item in both
+        trees is kept once. Should be called as avl = avl.union(other)
+
+        >>> avl = AVL.createFromList([1, 3, 5]).union(AVL.createFromList([2, 3, 4]))
+        >>> list(avl.iter_range())
+        [1, 2, 3, 4, 5]
+        """
+        return AVL._wrap(AVL._union(AVL._unwrap(self), AVL._unwrap(other), True))
+
+    def intersection(self, other):
+        """
+        Return the tree of the items in both self and other.
+
+        >>> avl = AVL.createFromList([1, 3, 5]).intersection(AVL.createFromList([2, 3, 5]))
+        >>> list(avl.iter_range())
+        [3, 5]
+        """
+        return AVL._wrap(AVL._intersection(AVL._unwrap(self), AVL._unwrap(other)))
+
+    def difference(self, other):
+        """
+        Return the tree of the items in self but not in other.
+
+        >>> avl = AVL.createFromList([1, 3, 5]).difference(AVL.createFromList([2, 3]))
+        >>> list(avl.iter_range())
+        [1, 5]
+        """
+        return AVL._wrap(AVL._difference(AVL._unwrap(self), AVL._unwrap(other)))
+
+    def insert_many(self, items):
+        """
+        Insert all items, duplicates are kept like insert.
+        Should be called as avl = avl.insert_many(items)
+
+        >>> avl = AVL.createFromList([5, 1]).insert_many([3, 1, 9])
+        >>> list(avl.iter_range())
+        [1, 1, 3, 5, 9]
+        """
+        batch = AVL._from_sorted(sorted(items))
+        return AVL._wrap(AVL._union(AVL._unwrap(self), batch, False))
+
+    @classmethod
+    def _unwrap(cls, tree):
+        # the EmptyNode root is None for join and split
+        if tree is None or tree.val == "EmptyNode":
+            return None
+        return tree
+
+    @classmethod
+    def _wrap(cls, tree):
+        return tree if tree else cls()
+
+    @classmethod
+    def _join(cls, left, node, right):
+        """
+        Link left, node and right, node is reused as the middle node.
+        """
+        left_height, right_height = cls.getHeight(left), cls.getHeight(right)
+        if left_height > right_height + 1:
+            left.right = cls._join(left.right, node, right)
+            return left._rebalance()
+        if right_height > left_height + 1:
+            right.left = cls._join(left, node, right.left)
+            return right._rebalance()
+        node.left, node.right = left, right
+        node._height = max(left_height, right_height) + 1
+        node._size = cls.getSize(left) + cls.getSize(right) + 1
+        return node
+
+    @classmethod
+    def _join2(cls, left, right):
+        """
+        Link left and right without a middle node.
+        """
+        if not right:
+            return left
+        right, min_val = right._deleteMin()
+        return cls._join(left, cls(min_val), right)
+
+    @classmethod
+    def _split(cls, tree, key):
+        if not tree:
+            return None, None
+        if tree.val < key:
+            small, large = cls._split(tree.right, key)
+            return cls._join(tree.left, tree, small), large
+        small, large = cls._split(tree.left, key)
+        return small, cls._join(large, tree, tree.right)
+
+    @classmethod
+    def _pop_equal(cls, tree, key):
+        """
+        Remove the items equal to key from a tree whose items are >= key.
+        Return the tree and whether key was found.
+        """
+        found = False
+        while tree and tree.findMin().val == key:
+            tree, _ = tree._deleteMin()
+            found = True
+        return tree, found
+
+    @classmethod
+    def _union(cls, tree1, tree2, distinct):
+        if not tree1:
+            return tree2
+        if not tree2:
+            return tree1
+        small, large = cls._split(tree2, tree1.val)
+        if distinct:
+            large, _ = cls._pop_equal(large, tree1.val)
+        left, right = tree1.left, tree1.right
+        return cls._join(cls._union(left, small, distinct), tree1,
+                         cls._union(right, large, distinct))
+
+    @classmethod
+    def _intersection(cls, tree1, tree2):
+        if not tree1 or not tree2:
+            return None
+        small, large = cls._split(tree2, tree1.val)
+        large, found = cls._pop_equal(large, tree1.val)
+        left, right = tree1.left, tree1.right
+        left = cls._intersection(left, small)
+        right = cls._intersection(right, large)
+        if found:
+            return cls._join(left, tree1, right)
+        return cls._join2(left, right)
+
+    @classmethod
+    def _difference(cls, tree1, tree2):
+        if not tree1 or not tree2:
+            return tree1
+        small, large = cls._split(tree2, tree1.val)
+        large, found = cls._pop_equal(large, tree1.val)
+        left, right = tree1.left, tree1.right
+        left = cls._difference(left, small)
+        right = cls._difference(right, large)
+        if found:
+            return cls._join2(left, right)
+        return cls._join(left, tree1, right)
+
+    @classmethod
+    def _from_sorted(cls, items):
+        """
+        Build a balanced tree from sorted items in O(N), None if no items.
+        """
+        if not items:
+            return None
+        root = cls()
+        stack = [(root, 0, len(items))]
+        while stack:
+            # node holds items[lo:hi], with the middle one as its value
+            node, lo, hi = stack.pop()
+            mid = (lo + hi) / 2
+            node.val, node._size = items[mid], hi - lo
+            # a perfectly balanced subtree of n nodes has height floor(log2(n))
+            node._height = (hi - lo).bit_length() - 1
+            if lo < mid:
+                node.left = cls()
+                stack.append((node.left, lo, mid))
+            if mid + 1 < hi:
+                node.right = cls()
+                stack.append((node.right, mid + 1, hi))
+        return root
+
+    def rank(self, match):
         """
-        this method is to support delete method, makes it efficient
+        Return the number of items smaller than match
+
+        >>> avl = AVL.createFromList([5, 1, 4, 4, 9])
+        >>> avl.rank(4), avl.rank(5), avl.rank(0), avl.rank(10)
+        (1, 3, 0, 5)
+        """
+        count, this_tree = 0, self
+        if this_tree.val == "EmptyNode":
+            return 0
+        while this_tree:
+            if match <= this_tree.val:
+                this_tree = this_tree.left
+            else:
+                # this_tree and its left subtree are all smaller
+                count += AVL.getSize(this_tree.left) + 1
+                this_tree = this_tree.right
+        return count
+
+    def select(self, k):
         """
+        Return the k-th smallest item, k starts from 0
+
+        >>> avl = AVL.createFromList([5, 1, 4, 4, 9])
+        >>> [avl.select(k) for k in xrange(5)]
+        [1, 4, 4, 5, 9]
+        """
+        if k < 0 or k >= self._size:
+            raise IndexError("select index out of range!")
         this_tree = self
-        while this_tree.left:
-            p_node = this_tree
-            this_tree = this_tree.left
-        # this_tree is the node with the Min val
-        if p_node.left and p_node.left.val == this_tree.val:
-            # p_node.left -> this_tree
-            p_node.left = this_tree.right
-        else:
-            p_node.right = this_tree.right
-        return this_tree.val
+        while 1:
+            left_size = AVL.getSize(this_tree.left)
+            if k < left_size:
+                this_tree = this_tree.left
+            elif k == left_size:
+                return this_tree.val
+            else:
+                k -= left_size + 1
+                this_tree = this_tree.right
+
+    def count_range(self, lo, hi):
+        """
+        Return the number of items in [lo, hi)
+
+        >>> AVL.createFromList([5, 1, 4, 4, 9]).count_range(2, 9)
+        3
+        """
+        if hi <= lo:
+            return 0
+        return self.rank(hi) - self.rank(lo)
 
     def delete(self, match):
         """
@@ -238,11 +588,11 @@ class AVL(BinaryTree):
                 # need to delete this root node
                 if self.right and self.left:
                     # this node has 2 children
-                    self.val = self.right._deleteMin(self)
+                    self.right, self.val = self.right._deleteMin()
                 else:
                     # this node has at most 1 children
-                    self = self.right if self.right else self.left
-            return self
+                    return self.right if self.right else self.left
+            return self._rebalance()
         # if all nodes of the tree have been deleted, return EmptyNode
         # There exists EmptyNode in the tree only at ROOT of the Tree
         after_deletion = _delete(self, match)
@@ -251,9 +601,353 @@ class AVL(BinaryTree):
         else:
             return AVL()        
 
+class _PersistentNode(object):
+    """
+    Node of PersistentAVL, it should not be changed after it is built.
+    """
+    __slots__ = ('val', 'left', 'right', '_height', '_size')
+
+    def __init__(self, val, left=None, right=None):
+        self.val = val
+        self.left = left
+        self.right = right
+        self._height = max(_height(left), _height(right)) + 1
+        self._size = _size(left) + _size(right) + 1
+
+
+def _height(node):
+    return node._height if node else -1
+
+
+def _size(node):
+    return node._size if node else 0
+
+
+class PersistentAVL(object):
+    """
+    AVL Tree with path copying, every snapshot is a version of the tree that
+    never changes.
+
+    >>> tree = PersistentAVL([3, 1, 2])
+    >>> old = tree.snapshot()
+    >>> tree.insert(5)
+    >>> tree.delete(1)
+    >>> list(tree), list(old)
+    ([2, 3, 5], [1, 2, 3])
+    """
+    def __init__(self, in_list=(), _root=None):
+        self._root = _root
+        # only writers take the lock, readers use the root they got
+        self._lock = threading.Lock()
+        for item in in_list:
+            self.insert(item)
+
+    def __len__(self):
+        return _size(self._root)
+
+    def __iter__(self):
+        return self.iter_range()
+
+    def snapshot(self):
+        """
+        Return a PersistentAVL of the current version, O(1).
+        """
+        return PersistentAVL(_root=self._root)
+
+    def find(self, match):
+        """
+        find item in the tree, return its node or None as AVL.find
+        """
+        this_tree = self._root
+        while this_tree and match != this_tree.val:
+            if match < this_tree.val:
+                this_tree = this_tree.left
+            else:
+                this_tree = this_tree.right
+        return this_tree
+
+    def findMin(self):
+        """
+        return the node with the smallest value, None if the tree is empty
+        """
+        this_tree = self._root
+        while this_tree and this_tree.left:
+            this_tree = this_tree.left
+        return this_tree
+
+    def findMax(self):
+        """
+        return the node with the largest value, None if the tree is empty
+        """
+        this_tree = self._root
+        while this_tree and this_tree.right:
+            this_tree = this_tree.right
+        return this_tree
+
+    def iter_range(self, lo=None, hi=None, reverse=False):
+        """
+        Generator of the items in [lo, hi) of this version, see AVL.iter_range
+        """
+        if self._root is None:
+            return iter(())
+        return _bst_module.range_walk(self._root, lo, hi, reverse)
+
+    def insert(self, content):
+        with self._lock:
+            self._root = PersistentAVL._insert(self._root, content)
+
+    def delete(self, match):
+        with self._lock:
+            self._root = PersistentAVL._delete(self._root, match)
+
+    @staticmethod
+    def _balance(val, left, right):
+        """
+        Build the node of val, left and right, with new nodes for the
+        rotation if AVL-condition is not reached.
+        """
+        if _height(left) - _height(right) == 2:
+            if _height(left.left) >= _height(left.right):
+                # single rotate
+                return _PersistentNode(left.val, left.left,
+                                       _PersistentNode(val, left.right, right))
+            # double rotate
+            mid = left.right
+            return _PersistentNode(mid.val,
+                                   _PersistentNode(left.val, left.left, mid.left),
+                                   _PersistentNode(val, mid.right, right))
+        if _height(right) - _height(left) == 2:
+            if _height(right.right) >= _height(right.left):
+                return _PersistentNode(right.val,
+                                       _PersistentNode(val, left, right.left),
+                                       right.right)
+            mid = right.left
+            return _PersistentNode(mid.val,
+                                   _PersistentNode(val, left, mid.left),
+                                   _PersistentNode(right.val, mid.right, right.right))
+        return _PersistentNode(val, left, right)
+
+    @staticmethod
+    def _insert(tree, content):
+        if tree is None:
+            return _PersistentNode(content)
+        if content < tree.val:
+            return PersistentAVL._balance(tree.val, PersistentAVL._insert(tree.left, content), tree.right)
+        return PersistentAVL._balance(tree.val, tree.left, PersistentAVL._insert(tree.right, content))
+
+    @staticmethod
+    def _delete(tree, match):
+        if tree is None:
+            raise ValueError("deletion node not found!!")
+        if match < tree.val:
+            return PersistentAVL._balance(tree.val, PersistentAVL._delete(tree.left, match), tree.right)
+        if match > tree.val:
+            return PersistentAVL._balance(tree.val, tree.left, PersistentAVL._delete(tree.right, match))
+        if tree.left is None:
+            return tree.right
+        if tree.right is None:
+            return tree.left
+        right, min_val = PersistentAVL._deleteMin(tree.right)
+        return PersistentAVL._balance(min_val, tree.left, right)
+
+    @staticmethod
+    def _deleteMin(tree):
+        if tree.left is None:
+            return tree.right, tree.val
+        left, min_val = PersistentAVL._deleteMin(tree.left)
+        return PersistentAVL._balance(tree.val, left, tree.right), min_val
+
+
+def avl_test():
+    import random
+    def check(tree):
+        # return the height and the size of tree, and check the AVL-condition
+        if tree is None:
+            return -1, 0
+        left_height, left_size = check(tree.left)
+        right_height, right_size = check(tree.right)
+        assert abs(left_height - right_height) <= 1
+        assert tree._height == max(left_height, right_height) + 1
+        assert tree._size == left_size + right_size + 1
+        return tree._height, tree._size
+
+    for length in (1, 2, 10, 300):
+        test = [random.randint(0, length) for i in xrange(length)]
+        avl = AVL.createFromList(test)
+        check(avl)
+        random.shuffle(test)
+        left = sorted(test)
+        for x in test:
+            avl = avl.delete(x)
+            left.remove(x)
+            if not left:
+                break
+            check(avl)
+            k = random.randrange(len(left))
+            assert avl.select(k) == left[k]
+            assert avl.rank(left[k]) == left.index(left[k])
+            lo, hi = random.randint(-1, length+1), random.randint(-1, length+1)
+            assert avl.count_range(lo, hi) == len([y for y in left if lo <= y < hi])
+        assert avl.val == "EmptyNode"
+    # range scan
+    tree = AVL.createFromList([random.randint(0, 100) for i in xrange(300)])
+    items = sorted(tree.iter_range())
+    assert list(tree.iter_range()) == items
+    for i in xrange(100):
+        lo, hi = random.randint(-5, 105), random.randint(-5, 105)
+        in_range = [x for x in items if lo <= x < hi]
+        assert list(tree.iter_range(lo, hi)) == in_range
+        assert list(tree.iter_range(lo, hi, reverse=True)) == in_range[::-1]
+        assert list(tree.iter_range(lo=lo)) == [x for x in items if lo <= x]
+        assert list(tree.iter_range(hi=hi, reverse=True)) == [x for x in items if x < hi][::-1]
+    scan = tree.iter_range(50)
+    assert [next(scan) for i in xrange(3)] == [x for x in items if x >= 50][:3]
+    assert list(AVL().iter_range()) == []
+    # join, split and set operations
+    for length in (0, 1, 5, 200):
+        test1 = random.sample(xrange(400), length)
+        test2 = random.sample(xrange(400), random.randint(0, 300))
+        set1, set2 = set(test1), set(test2)
+        union = AVL.createFromList(test1).union(AVL.createFromList(test2))
+        check(AVL._unwrap(union))
+        assert list(union.iter_range()) == sorted(set1 | set2)
+        intersection = AVL.createFromList(test1).intersection(AVL.createFromList(test2))
+        check(AVL._unwrap(intersection))
+        assert list(intersection.iter_range()) == sorted(set1 & set2)
+        difference = AVL.createFromList(test1).difference(AVL.createFromList(test2))
+        check(AVL._unwrap(difference))
+        assert list(difference.iter_range()) == sorted(set1 - set2)
+        key = random.randint(0, 400)
+        small, large = AVL.createFromList(test1).split(key)
+        check(AVL._unwrap(small))
+        check(AVL._unwrap(large))
+        assert list(small.iter_range()) == sorted(x for x in test1 if x < key)
+        assert list(large.iter_range()) == sorted(x for x in test1 if x >= key)
+        joined = AVL.join(small, key, large)
+        check(joined)
+        assert list(joined.iter_range()) == sorted(test1 + [key])
+        batch = [random.randint(0, 50) for i in xrange(length)]
+        avl = AVL.createFromList(test2).insert_many(batch)
+        check(AVL._unwrap(avl))
+        assert list(avl.iter_range()) == sorted(test2 + batch)
+    # persistent tree, every snapshot keeps its items
+    tree, versions = PersistentAVL(), []
+    items = []
+    for i in xrange(300):
+        if items and random.random() < 0.3:
+            x = random.choice(items)
+            tree.delete(x)
+            items.remove(x)
+        else:
+            x = random.randint(0, 100)
+            tree.insert(x)
+            items.append(x)
+        versions.append((tree.snapshot(), sorted(items)))
+    for snapshot, snapshot_items in versions:
+        check(snapshot._root)
+        assert list(snapshot) == snapshot_items
+        assert len(snapshot) == len(snapshot_items)
+        assert list(snapshot.iter_range(30, 70, reverse=True)) == \
+               [x for x in reversed(snapshot_items) if 30 <= x < 70]
+        if snapshot_items:
+            assert snapshot.findMin().val == snapshot_items[0]
+            assert snapshot.findMax().val == snapshot_items[-1]
+        for x in (-1, 50, 101):
+            node = snapshot.find(x)
+            assert node.val == x if x in snapshot_items else node is None
+    empty = PersistentAVL()
+    assert empty.find(1) is None and empty.findMin() is None and empty.findMax() is None
+    assert list(empty.iter_range()) == []
+    try:
+        tree.delete(1000)
+        assert False
+    except ValueError:
+        pass
+    print "avl test passed!"
+
+
+def bulk_benchmark(length=100000, batch_lengths=(100, 10000, 100000)):
+    """
+    Compare insert_many and union with repeated insert into a tree of
+    `length` random items.
+    """
+    import random
+    from time import time
+    test = [random.random() for i in xrange(length)]
+    for batch_length in batch_lengths:
+        batch = [random.random() for i in xrange(batch_length)]
+        avl = AVL.createFromList(test)
+        start = time()
+        for item in batch:
+            avl = avl.insert(item)
+        print "%7d + %7d repeated insert %f" % (length, batch_length, time()-start)
+        avl = AVL.createFromList(test)
+        start = time()
+        avl = avl.insert_many(batch)
+        print "%7d + %7d insert_many     %f" % (length, batch_length, time()-start)
+        avl, other = AVL.createFromList(test), AVL.createFromList(batch)
+        start = time()
+        avl = avl.union(other)
+        print "%7d + %7d union           %f" % (length, batch_length, time()-start)
+
+
+def persistent_benchmark(length=100000, seconds=2.0):
+    """
+    Memory per version of PersistentAVL, and read throughput of snapshot
+    scans with and without a writer thread.
+    """
+    import random
+    import sys
+    from time import time
+    tree, roots = PersistentAVL(), []
+    for i in xrange(length):
+        tree.insert(random.random())
+        roots.append(tree._root)
+    # count the nodes of all versions, a shared node is counted once
+    seen, stack = set(), list(roots)
+    while stack:
+        node = stack.pop()
+        if node is not None and id(node) not in seen:
+            seen.add(id(node))
+            stack.append(node.left)
+            stack.append(node.right)
+    per_version = float(len(seen)) / length
+    node_bytes = sys.getsizeof(roots[-1])
+    del roots, seen
+    print "nodes per version %.1f (%d bytes per node, %d bytes per version)" % (
+        per_version, node_bytes, per_version * node_bytes)
+
+    def read(deadline):
+        count = 0
+        while time() < deadline:
+            for item in tree.snapshot():
+                count += 1
+                if not count & 0xfff and time() >= deadline:
+                    break
+        return count
+
+    start = time()
+    print "read throughput %d items/s alone" % (read(start + seconds) / (time() - start))
+    written = [0]
+    def write(deadline):
+        while time() < deadline:
+            tree.insert(random.random())
+            written[0] += 1
+    writer = threading.Thread(target=write, args=(time() + seconds,))
+    start = time()
+    writer.start()
+    count = read(start + seconds)
+    writer.join()
+    print "read throughput %d items/s with a writer, writer %d items/s" % (
+        count / (time() - start), written[0] / (time() - start))
+
+
 if __name__ == "__main__":
     import doctest
     import random
     doctest.testmod()
+    avl_test()
+    # bulk_benchmark()
+    # persistent_benchmark()
     my_avl = AVL.createFromList(xrange(1,100))
     my_avl.display()
\ No newline at end of file
@@ -1,4 +1,42 @@
-from Queue import Queue
+# Binary Tree Serialization, Leetcode 297
+#
+# List Format: serialize lists the values in level order, with '#' for every
+#           missing child, and the '#' at the end are cut off. For example,
+#           [1, 2, 3, '#', '#', 4, '#', '#', 5]
+#
+# Streaming: iter_serialize yields the tokens one by one and deserialize_stream
+#           takes any iterable of tokens. dump_stream and load_stream write and
+#           read one token per line through buffered files, so a tree is saved
+#           and loaded without a list of all its tokens. Both only keep the
+#           nodes of about one level in a queue beside the tree itself.
+#
+# Binary Format: serializeToBinary packs the tree into one string
+#           header:     struct '<4scQ', magic 'BTB1', value typecode, node count N
+#           structure:  2 bits per node in level order, bit 0 for the left child
+#                       and bit 1 for the right child, ceil(N / 4) bytes
+#           values:     N values in level order, packed by struct with the
+#                       typecode ('q' for 8-byte ints, 'i', 'd' for floats ...)
+#           The children of the nodes in level order are also in level order,
+#           so the structure bits are enough to link the nodes back.
+#           deserializeFromBinary reads any buffer (str, bytearray, memoryview,
+#           mmap) by struct.unpack_from, the values of all nodes are read in one
+#           call without slicing the buffer item by item.
+#
+#           binary_benchmark, a random tree of 100000 int nodes:
+#               format              size        encode      decode
+#               list + pickle       787347    1.249651    1.598507
+#               pickle the tree    2986266    0.810883    0.639655
+#               binary 'q'          825013    0.149661    0.284525
+#               binary 'i'          425013    0.171446    0.407918
+#           The list format is as small as 'q' only because pickle packs the
+#           small ints in fewer bytes, the '#' markers cost one byte each.
+#
+
+import struct
+from collections import deque
+
+_BINARY_HEADER = struct.Struct('<4scQ')
+_BINARY_MAGIC = 'BTB1'
 
 class BinaryTree(object):
     def __init__(self, content="EmptyNode"):
@@ -24,41 +62,157 @@ class BinaryTree(object):
 
     @classmethod
     def deserializeFromList(cls, in_list):
-        res = BinaryTree()
-        queue = Queue()
-        queue.put((res, False))
-        for item in in_list:
-            if not queue.empty():
-                this_node = queue.get(block=False)
+        return cls.deserialize_stream(in_list)
+
+    @classmethod
+    def deserialize_stream(cls, tokens):
+        """
+        Build the tree from an iterable of tokens in the list format, the
+        tokens are consumed one by one, so a generator works.
+
+        >>> tokens = iter([1, 2, 3, '#', '#', 4, '#', '#', 5])
+        >>> BinaryTree.deserialize_stream(tokens).serialize()
+        [1, 2, 3, '#', '#', 4, '#', '#', 5]
+        """
+        res = cls()
+        # the nodes waiting for a child, (node, False) for the left child
+        queue = deque()
+        queue.append((res, False))
+        for item in tokens:
+            if queue:
+                this_node = queue.popleft()
             else:
                 raise ValueError("Deserialization list error!")
             if item != '#':
                 new_node = this_node[0].raw_insert(item, this_node[1])
-                queue.put((new_node,False))
-                queue.put((new_node,True))
+                queue.append((new_node, False))
+                queue.append((new_node, True))
 
         return res
 
     def serialize(self):
-        queue = Queue()
-        res = list()
-        queue.put(self)
-        while not queue.empty():
-            this_node = queue.get(block=False)
+        return list(self.iter_serialize())
+
+    def iter_serialize(self):
+        """
+        Generator of the tokens of the list format. The '#' are counted and
+        only yielded before the next value, so the ones at the end are cut
+        off without keeping the tokens.
+        """
+        queue = deque()
+        queue.append(self)
+        missing = 0
+        while queue:
+            this_node = queue.popleft()
             if this_node:
-                res.append(this_node.val)
-                queue.put(this_node.left)
-                queue.put(this_node.right)
+                for i in xrange(missing):
+                    yield '#'
+                missing = 0
+                yield this_node.val
+                queue.append(this_node.left)
+                queue.append(this_node.right)
             else:
-                res.append('#')
-        last = -1
-        while res[last] == '#':
-            last -= 1
-        if last == -1:
-            return res
-        return res[:last+1]
+                missing += 1
+
+    def dump_stream(self, path, buffer_size=1 << 16):
+        """
+        Write the tokens of the list format to a file, one token per line by
+        str(), or repr() for floats so that they keep all their digits, with
+        buffered writes. An empty tree makes an empty file.
+        """
+        with open(path, 'wb', buffer_size) as out_file:
+            if self.val != "EmptyNode":
+                out_file.writelines('%r\n' % token if isinstance(token, float) else '%s\n' % token
+                                    for token in self.iter_serialize())
+
+    @classmethod
+    def load_stream(cls, path, value=int, buffer_size=1 << 16):
+        """
+        Build the tree from a file written by dump_stream, the values are
+        converted back by `value`. Only the tree and the nodes waiting for
+        their children are kept in memory, not the tokens.
+        """
+        return cls.deserialize_stream(iter_file_tokens(path, value, buffer_size))
+
+    def serializeToBinary(self, typecode='q'):
+        """
+        Return the tree in the binary format as one string, so it could be
+        written to a file by one write.
 
+        >>> tree = BinaryTree.deserializeFromList([1, 2, 3, '#', '#', 4, '#', '#', 5])
+        >>> data = tree.serializeToBinary('i')
+        >>> len(data), BinaryTree.deserializeFromBinary(data).serialize()
+        (35, [1, 2, 3, '#', '#', 4, '#', '#', 5])
+        """
+        values = []
+        bitmap = bytearray()
+        if self.val != "EmptyNode":
+            queue = deque([self])
+            byte = 0
+            while queue:
+                this_node = queue.popleft()
+                idx = len(values)
+                values.append(this_node.val)
+                flags = 0
+                if this_node.left:
+                    flags = 1
+                    queue.append(this_node.left)
+                if this_node.right:
+                    flags |= 2
+                    queue.append(this_node.right)
+                byte |= flags << ((idx & 3) << 1)
+                if idx & 3 == 3:
+                    bitmap.append(byte)
+                    byte = 0
+            if len(values) & 3:
+                bitmap.append(byte)
+        try:
+            packed = struct.pack('<%d%s' % (len(values), typecode), *values)
+        except struct.error as e:
+            raise ValueError("values could not be packed as '%s': %s" % (typecode, e))
+        return ''.join((_BINARY_HEADER.pack(_BINARY_MAGIC, typecode, len(values)),
+                        str(bitmap), packed))
 
+    @classmethod
+    def deserializeFromBinary(cls, buf):
+        """
+        Build the tree from the binary format in a buffer. The node count of
+        the header is checked against the size of the buffer before anything
+        is allocated, so a corrupt header raises ValueError.
+        """
+        try:
+            magic, typecode, length = _BINARY_HEADER.unpack_from(buf, 0)
+            if magic != _BINARY_MAGIC:
+                raise ValueError("Deserialization binary error!")
+            offset = _BINARY_HEADER.size
+            if len(buf) - offset < (length + 3) / 4 + length * struct.calcsize('<' + typecode):
+                raise ValueError("Deserialization binary error!")
+            bitmap = struct.unpack_from('<%dB' % ((length + 3) / 4), buf, offset)
+            offset += len(bitmap)
+            values = struct.unpack_from('<%d%s' % (length, typecode), buf, offset)
+        except struct.error:
+            raise ValueError("Deserialization binary error!")
+        if not length:
+            return cls()
+        nodes = [cls(value) for value in values]
+        child = 1
+        try:
+            for idx, this_node in enumerate(nodes):
+                if idx >= child:
+                    # this node is not the child of any node before
+                    raise IndexError
+                flags = bitmap[idx >> 2] >> ((idx & 3) << 1)
+                if flags & 1:
+                    this_node.left = nodes[child]
+                    child += 1
+                if flags & 2:
+                    this_node.right = nodes[child]
+                    child += 1
+        except IndexError:
+            raise ValueError("Deserialization binary error!")
+        if child != length:
+            raise ValueError("Deserialization binary error!")
+        return nodes[0]
 
     def raw_insert(self, content, flag):
         """
@@ -83,7 +237,131 @@ class BinaryTree(object):
             raise ValueError("Insertion Error!!")
 
 
+def iter_file_tokens(path, value=int, buffer_size=1 << 16):
+    """
+    Generator of the tokens of a file written by BinaryTree.dump_stream.
+    """
+    with open(path, 'rb', buffer_size) as in_file:
+        for line in in_file:
+            token = line[:-1] if line.endswith('\n') else line
+            yield token if token == '#' else value(token)
+
+
+def serialization_test():
+    import mmap
+    import os
+    import random
+    import tempfile
+    for length in (0, 1, 2, 10, 1000):
+        tree = random_tree(length)
+        in_list = tree.serialize() if length else []
+        assert BinaryTree.deserializeFromList(in_list).serialize() == in_list or not length
+        for typecode in ('q', 'i', 'd'):
+            data = tree.serializeToBinary(typecode)
+            for buf in (data, bytearray(data), memoryview(data)):
+                res = BinaryTree.deserializeFromBinary(buf)
+                assert res.val == "EmptyNode" if not length else res.serialize() == in_list
+        # decode from a memory-mapped file
+        with tempfile.TemporaryFile() as f:
+            f.write(tree.serializeToBinary())
+            f.flush()
+            if length:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                assert BinaryTree.deserializeFromBinary(buf).serialize() == in_list
+                buf.close()
+    # streaming to and from a file
+    for length in (0, 1, 1000):
+        tree = random_tree(length)
+        tokens = list(tree.iter_serialize())
+        assert length == 0 or tokens[-1] != '#'
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            tree.dump_stream(path, buffer_size=4096)
+            res = BinaryTree.load_stream(path, buffer_size=4096)
+            assert res.val == "EmptyNode" if not length else res.serialize() == tokens
+        finally:
+            os.remove(path)
+    res = BinaryTree.deserialize_stream(x for x in tokens)
+    assert res.serialize() == tokens
+    # floats keep all their digits in the file
+    tokens = [0.1234567890123456, 1e300, -2.5e-310, '#', 1.0 / 3]
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        BinaryTree.deserializeFromList(tokens).dump_stream(path)
+        assert BinaryTree.load_stream(path, value=float).serialize() == tokens
+    finally:
+        os.remove(path)
+    data = random_tree(100).serializeToBinary()
+    corrupt = [data[:-1], data[:10], 'XXXX' + data[4:], data[:13] + '\xff' * 25 + data[38:],
+               data[:4] + 'Z' + data[5:]]
+    # node counts in the header that the buffer is too short for
+    for length in (101, 2 ** 40, 2 ** 64 - 1):
+        corrupt.append(data[:5] + struct.pack('<Q', length) + data[13:])
+    for bad in corrupt:
+        try:
+            BinaryTree.deserializeFromBinary(bad)
+            assert False
+        except ValueError:
+            pass
+    print "serialization test passed!"
+
+
+def random_tree(length):
+    """
+    Return a tree of `length` random int nodes, built by inserting into a BST.
+    """
+    import random
+    root = BinaryTree()
+    for x in random.sample(xrange(length * 10), length):
+        if root.val == "EmptyNode":
+            root.val = x
+            continue
+        this_node = root
+        while True:
+            if x < this_node.val:
+                if not this_node.left:
+                    this_node.left = BinaryTree(x)
+                    break
+                this_node = this_node.left
+            else:
+                if not this_node.right:
+                    this_node.right = BinaryTree(x)
+                    break
+                this_node = this_node.right
+    return root
+
+
+def binary_benchmark(length=100000):
+    """
+    Compare size and encode/decode time of the binary format with the list
+    format (pickled) and pickling the tree.
+    """
+    import cPickle as pickle
+    from time import time
+    tree = random_tree(length)
+    formats = [
+        ("list + pickle", lambda: pickle.dumps(tree.serialize(), 2),
+         lambda data: BinaryTree.deserializeFromList(pickle.loads(data))),
+        ("pickle the tree", lambda: pickle.dumps(tree, 2), pickle.loads),
+        ("binary 'q'", lambda: tree.serializeToBinary('q'), BinaryTree.deserializeFromBinary),
+        ("binary 'i'", lambda: tree.serializeToBinary('i'), BinaryTree.deserializeFromBinary)]
+    print "format              size        encode      decode"
+    for name, encode, decode in formats:
+        start = time()
+        data = encode()
+        encode_time = time() - start
+        start = time()
+        decode(data)
+        print "%-17s %8d    %f    %f" % (name, len(data), encode_time, time() - start)
+
+
 if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
+    serialization_test()
+    # binary_benchmark()
     my_tree = BinaryTree.deserializeFromList([1,2,3,'#','#',4,'#','#',5, '#', '#'])
     my_tree.display()
     print my_tree.serialize()
\ No newline at end of file
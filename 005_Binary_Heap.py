@@ -1,7 +1,8 @@
 # Priority Queue(Heap) in 'Data Structure and Algorithm Analysis' P.182
 #
 # Instance variable:
-#       _size:      The max number of elements that the heap could contain
+#       _size:      The max number of elements that the heap could contain now,
+#                   it is doubled when an element is inserted into a full heap
 #       _capacity:  The current number of elements in the heap
 #       _elements:  The list that contains all the elements, and
 #                   len(_elements) should be equal to _size + 1 for index 0
@@ -23,6 +24,77 @@
 #       while when percolating up, we need only concern about its unique parent.
 #
 #
+#       BuildHeap:  Put all the elements into the slots as they are, then percolate
+#                   down every node that has children, from the last one to the
+#                   root. Most nodes are near the bottom and percolate down only a
+#                   few levels, so it takes O(N) instead of N inserts, O(NlogN).
+#                   insertElements does the same for a batch larger than
+#                   1/BULK_RATIO of the heap, since percolating down every parent
+#                   again costs O(N + K) for K new elements.
+#
+#       build_benchmark, 1000000 random floats:
+#           insert one by one           1.178267
+#           creat_from_list             0.362552
+#           10 batches of 100000 into an empty heap:
+#               one by one              0.938943
+#               insertElements          0.691933
+#           Inserting random elements one by one only moves up about 1.6 levels
+#           on average, so BULK_RATIO from 1 to 8 made little difference.
+#
+# D-ary Heap: Every node has d children instead of 2, the children of slot i are
+#           slots d*i+1 ... d*i+d (starting from slot 0). The tree is only
+#           log_d(N) levels deep, so insert moves up fewer levels, while delMin
+#           looks for the smallest of d children on every level, which is one
+#           slice and min() of the array in C. The priorities are kept in an
+#           array ('d' for floats, 'l' for ints), so they are not boxed as
+#           Python objects in the heap, and the payloads in a parallel list.
+#
+#       dary_benchmark, 1000000 random floats:
+#           d       push-heavy      pop-heavy
+#           2       3.334418        13.644837
+#           4       2.734855        9.911412
+#           8       2.313501        9.406805
+#           16      2.534506        6.482875
+#           BinaryHeap of the floats only:
+#                   1.414377        6.662430
+#           push-heavy: 1000000 inserts with a delMin after every 10 inserts
+#           pop-heavy:  creat_from_list of 1000000, then delMin all of them
+#           A larger d is faster on both workloads. DaryHeap also moves the
+#           payloads, and reading the array still boxes every priority it looks
+#           at, so it is not faster than BinaryHeap of bare floats. What the
+#           array saves is memory, 8 bytes per priority instead of a float
+#           object and a pointer of the list, 32 bytes.
+#
+# Pairing Heap: A heap-ordered tree of any shape, every node keeps its leftmost
+#           child and its next sibling. Two heaps are linked in O(1), the root
+#           with the larger priority becomes the leftmost child of the other.
+#           insert and meld are just a link. delMin removes the root and links
+#           its children in two passes, pairs from left to right, then the
+#           pairs from right to left, O(logN) amortized. insert returns the node
+#           as a handle, and decrease_key cuts the subtree of the handle and
+#           links it with the root, O(1) in practice (o(logN) amortized).
+#           Dijkstra's algorithm (017) uses it to update a distance in place.
+#
+# Top-K:    TopK keeps the k largest items of a stream in a BinaryHeap of size k,
+#           whose root is the smallest of them. A new item only goes in if it
+#           is larger than the root, then it replaces the root by replaceMin and
+#           percolates down. It takes O(Nlogk) time and O(k) memory for any
+#           iterator. The entries are (key, -order, item), so items are never
+#           compared, and among equal keys the earlier items are kept, the same
+#           as sorted(items, key=key, reverse=True)[:k].
+#           The TopK of every part of a stream (e.g. in worker processes) could
+#           be merged into the TopK of the whole stream by merge, a TopK is
+#           pickled with its heap when its key could be pickled.
+#
+#       topk_benchmark, k = 100 of 1000000 random floats:
+#           TopK.update             0.103444
+#           heapq.nlargest          0.137153
+#           BinaryHeap of all       0.711572
+#           sorted                  0.596995
+#           Most items are rejected by one comparison with the key of the
+#           root, which TopK keeps in a local variable while it updates, so it
+#           is even a bit faster than heapq.nlargest in C here.
+#
 # Tips: Any integer compare with None in Python would always return False
 #           >>> 0 < None
 #           False
@@ -35,9 +107,29 @@
 # Binary Heap is always a complete binary tree. No need to worry about
 # balance problem.
 #
+# Snapshot: snapshot() packs the elements _elements[1:_capacity+1] by
+#           pack_numbers of 022_Packed_Numbers.py, and pickling writes the
+#           snapshot instead of the list of N numbers.
+#
+#           snapshot_benchmark, a heap of 1000000 random floats:
+#               pickle of __dict__      size 9002058    dump 0.045786    load 0.067147
+#               pickle by snapshot      size 8000047    dump 0.151038    load 0.033937
+#           Checking that all elements are floats costs most of the dump time.
+#           The load only builds the floats back, by array.tolist().
+#
 
-class BinaryHeap(object):
-    def __init__(self, maxsize):
+import imp
+import os
+from array import array
+
+_packed = imp.load_source('packed_numbers',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '022_Packed_Numbers.py'))
+
+
+class BinaryHeap(_packed.Snapshot):
+    BULK_RATIO = 4
+
+    def __init__(self, maxsize=16):
         self._size = maxsize
         self._capacity = 0
         self._elements = [None for i in xrange(self._size+1)]
@@ -62,8 +154,9 @@ class BinaryHeap(object):
         0
         """
         this_heap = cls(int(len(in_list)*1.5))
-        for element in in_list:
-            this_heap.insert(element)
+        this_heap._elements[1:len(in_list)+1] = in_list
+        this_heap._capacity = len(in_list)
+        this_heap._buildHeap()
         return this_heap
 
     @property 
@@ -136,7 +229,7 @@ class BinaryHeap(object):
 
     def insert(self, element):
         if self.isFull:
-            raise ValueError('Heap is already full!')
+            self._grow(self._capacity + 1)
         slot_index = self._capacity + 1
         # when slot_index == 1, then slot_index/2 == 0
         # at this time, self._elements[slot_index/2] == None
@@ -149,10 +242,62 @@ class BinaryHeap(object):
         self._capacity += 1
 
     def insertElements(self, elements):
+        """
+        Insert all elements. If there are many of them, put them after the
+        last element and build the heap again.
+
+        >>> test = BinaryHeap(2)
+        >>> test.insertElements([5, 3, 9, 1])
+        >>> test.insertElements([4, 0])
+        >>> [test.delMin() for i in xrange(test.length)], test.maxsize
+        ([0, 1, 3, 4, 5, 9], 8)
+        """
+        elements = list(elements)
         if self._capacity + len(elements) > self._size:
-            raise ValueError("Too many elements to be inserted")
-        for element in elements:
-            self.insert(element)
+            self._grow(self._capacity + len(elements))
+        if len(elements) * self.BULK_RATIO > self._capacity:
+            start = self._capacity + 1
+            self._elements[start:start+len(elements)] = elements
+            self._capacity += len(elements)
+            self._buildHeap()
+        else:
+            for element in elements:
+                self.insert(element)
+
+    def _grow(self, min_size):
+        """
+        Make room for at least min_size elements by doubling the size.
+        """
+        new_size = max(self._size * 2, min_size)
+        self._elements.extend(None for i in xrange(new_size - self._size))
+        self._size = new_size
+
+    def _buildHeap(self):
+        """
+        Floyd's O(N) heap construction, percolate down all the nodes with
+        children from the last one to the root.
+        """
+        for slot_index in xrange(self._capacity / 2, 0, -1):
+            self._percolateDown(slot_index, self._elements[slot_index])
+
+    def _percolateDown(self, slot_index, element):
+        """
+        Put element into slot_index, and move it down until both of its
+        children are larger.
+        """
+        elements, capacity = self._elements, self._capacity
+        child = slot_index * 2
+        while child <= capacity:
+            # find the smaller child
+            if child != capacity and elements[child+1] < elements[child]:
+                child += 1
+            if element > elements[child]:
+                elements[slot_index] = elements[child]
+            else:
+                break
+            slot_index = child
+            child = slot_index * 2
+        elements[slot_index] = element
 
     def delMin(self):
         """
@@ -181,22 +326,10 @@ class BinaryHeap(object):
         self._elements[self._capacity] = None
         # update current capacity
         self._capacity -= 1
-
         # start percolating down
         # put the smaller child's value into parent's slot
-        slot_index = 1
-        while slot_index*2 <= self._capacity:
-            # find the smaller child
-            child = slot_index * 2
-            if child != self._capacity and self._elements[child+1] < self._elements[child]:
-                child += 1
-            if last > self._elements[child]:
-                self._elements[slot_index] = self._elements[child]
-            else:
-                break
-            slot_index = child
-        # put the last's value into the smaller child's slot
-        self._elements[slot_index] = last
+        if self._capacity:
+            self._percolateDown(1, last)
         return min
 
     def findMin(self):
@@ -204,11 +337,558 @@ class BinaryHeap(object):
             raise ValueError("This is an empty Heap!! No min found!")
         return self._elements[1]
 
+    def replaceMin(self, element):
+        """
+        Return the min element and replace it with element, which is faster
+        than delMin and insert.
+
+        >>> test = BinaryHeap.creat_from_list([3, 1, 2])
+        >>> test.replaceMin(5), test.findMin()
+        (1, 2)
+        """
+        if self.isEmpty:
+            raise ValueError("Can't delete element from empty heap.")
+        min = self._elements[1]
+        self._percolateDown(1, element)
+        return min
+
+    def snapshot(self):
+        """
+        Return the state of the heap as (maxsize, length, format, packed elements).
+
+        >>> test = BinaryHeap.creat_from_list([5, 2, 8])
+        >>> res = BinaryHeap.restore(test.snapshot())
+        >>> [res.delMin() for i in xrange(res.length)], res.maxsize
+        ([2, 5, 8], 4)
+        """
+        return (self._size, self._capacity) + \
+               _packed.pack_numbers(self._elements[1:self._capacity+1])
+
+    def __setstate__(self, state):
+        self._size, self._capacity = state[0], state[1]
+        self._elements = [None] + _packed.unpack_numbers(state[2], state[3])
+        self._elements.extend(None for i in xrange(self._size - self._capacity))
+
     def __str__(self):
         return self._elements.__str__()
     __repr__ = __str__
 
 
+class DaryHeap(object):
+    """
+    Min heap of (priority, payload) with `arity` children per node.
+
+    >>> test = DaryHeap(arity=4)
+    >>> for priority in [5.0, 1.5, 3.0, 0.5]:
+    ...     test.insert(priority, str(priority))
+    >>> test.findMin(), test.delMin(), test.delMin(), test.length
+    ((0.5, '0.5'), (0.5, '0.5'), (1.5, '1.5'), 2)
+    """
+    def __init__(self, arity=4, typecode='d'):
+        if arity < 2:
+            raise ValueError("arity should be at least 2!")
+        self._arity = arity
+        self._priorities = array(typecode)
+        self._payloads = []
+
+    @classmethod
+    def creat_from_list(cls, priorities, payloads=None, arity=4, typecode='d'):
+        """
+        Build the heap in O(N) by percolating down all the nodes with children.
+        """
+        this_heap = cls(arity, typecode)
+        this_heap._priorities.extend(priorities)
+        if payloads is None:
+            this_heap._payloads = [None] * len(this_heap._priorities)
+        else:
+            this_heap._payloads = list(payloads)
+            if len(this_heap._payloads) != len(this_heap._priorities):
+                raise ValueError("priorities and payloads should be of the same length!")
+        for slot_index in xrange((len(this_heap._priorities) - 2) / arity, -1, -1):
+            this_heap._percolateDown(slot_index, this_heap._priorities[slot_index],
+                                     this_heap._payloads[slot_index])
+        return this_heap
+
+    @property
+    def length(self):
+        return len(self._priorities)
+
+    @property
+    def isEmpty(self):
+        return not self._priorities
+
+    def insert(self, priority, payload=None):
+        priorities, payloads, arity = self._priorities, self._payloads, self._arity
+        priorities.append(priority)
+        payloads.append(payload)
+        # the appended slot is the hole, move the parents down into it
+        slot_index = len(priorities) - 1
+        priority = priorities[slot_index]
+        while slot_index:
+            parent = (slot_index - 1) / arity
+            if priority >= priorities[parent]:
+                break
+            priorities[slot_index] = priorities[parent]
+            payloads[slot_index] = payloads[parent]
+            slot_index = parent
+        priorities[slot_index] = priority
+        payloads[slot_index] = payload
+
+    def findMin(self):
+        if not self._priorities:
+            raise ValueError("This is an empty Heap!! No min found!")
+        return self._priorities[0], self._payloads[0]
+
+    def delMin(self):
+        """
+        Return (priority, payload) of the min priority and delete it.
+        """
+        if not self._priorities:
+            raise ValueError("Can't delete element from empty heap.")
+        res = self._priorities[0], self._payloads[0]
+        last, last_payload = self._priorities.pop(), self._payloads.pop()
+        if self._priorities:
+            self._percolateDown(0, last, last_payload)
+        return res
+
+    def _percolateDown(self, slot_index, priority, payload):
+        priorities, payloads, arity = self._priorities, self._payloads, self._arity
+        length = len(priorities)
+        first = slot_index * arity + 1
+        while first < length:
+            children = priorities[first:first+arity]
+            smallest = min(children)
+            if priority <= smallest:
+                break
+            child = first + children.index(smallest)
+            priorities[slot_index] = smallest
+            payloads[slot_index] = payloads[child]
+            slot_index = child
+            first = slot_index * arity + 1
+        priorities[slot_index] = priority
+        payloads[slot_index] = payload
+
+
+class PairingNode(object):
+    """
+    The handle of an element of PairingHeap.
+    prev is the parent for the leftmost child, or the left sibling.
+    """
+    __slots__ = ('priority', 'payload', 'child', 'sibling', 'prev')
+
+    def __init__(self, priority, payload):
+        self.priority = priority
+        self.payload = payload
+        self.child = self.sibling = self.prev = None
+
+
+class PairingHeap(object):
+    """
+    Min heap of (priority, payload) with decrease_key and meld.
+
+    >>> test = PairingHeap()
+    >>> handles = [test.insert(priority, name) for priority, name in [(5, 'a'), (3, 'b'), (8, 'c')]]
+    >>> test.decrease_key(handles[2], 1)
+    >>> other = PairingHeap()
+    >>> handle = other.insert(2, 'd')
+    >>> test.meld(other)
+    >>> [test.delMin() for i in xrange(test.length)]
+    [(1, 'c'), (2, 'd'), (3, 'b'), (5, 'a')]
+    """
+    def __init__(self):
+        self._root = None
+        self._length = 0
+
+    @property
+    def length(self):
+        return self._length
+
+    @property
+    def isEmpty(self):
+        return self._root is None
+
+    @staticmethod
+    def _link(first, second):
+        """
+        Link two roots, return the new root.
+        """
+        if second.priority < first.priority:
+            first, second = second, first
+        second.prev = first
+        second.sibling = first.child
+        if first.child:
+            first.child.prev = second
+        first.child = second
+        return first
+
+    def insert(self, priority, payload=None):
+        """
+        Insert and return the handle of the new element.
+        """
+        node = PairingNode(priority, payload)
+        self._root = node if self._root is None else PairingHeap._link(self._root, node)
+        self._length += 1
+        return node
+
+    def meld(self, other):
+        """
+        Move all the elements of other into this heap, O(1).
+        """
+        if other._root is not None:
+            self._root = other._root if self._root is None else \
+                         PairingHeap._link(self._root, other._root)
+            self._length += other._length
+            other._root, other._length = None, 0
+
+    def findMin(self):
+        if self._root is None:
+            raise ValueError("This is an empty Heap!! No min found!")
+        return self._root.priority, self._root.payload
+
+    def decrease_key(self, node, priority):
+        """
+        Lower the priority of the element of handle `node`, which should be
+        in this heap.
+        """
+        if priority > node.priority:
+            raise ValueError("New priority is larger than the current one!")
+        node.priority = priority
+        if node is self._root:
+            return
+        # cut the subtree of node
+        if node.prev.child is node:
+            node.prev.child = node.sibling
+        else:
+            node.prev.sibling = node.sibling
+        if node.sibling:
+            node.sibling.prev = node.prev
+        node.sibling = node.prev = None
+        self._root = PairingHeap._link(self._root, node)
+
+    def delMin(self):
+        """
+        Return (priority, payload) of the min priority and delete it.
+        """
+        root = self._root
+        if root is None:
+            raise ValueError("Can't delete element from empty heap.")
+        # first pass: link the children in pairs from left to right
+        pairs, child = [], root.child
+        while child:
+            second = child.sibling
+            child.prev = child.sibling = None
+            if second is None:
+                pairs.append(child)
+                break
+            child_next = second.sibling
+            second.prev = second.sibling = None
+            pairs.append(PairingHeap._link(child, second))
+            child = child_next
+        # second pass: link the pairs from right to left
+        new_root = pairs.pop() if pairs else None
+        while pairs:
+            new_root = PairingHeap._link(pairs.pop(), new_root)
+        self._root = new_root
+        self._length -= 1
+        root.child = None
+        return root.priority, root.payload
+
+
+class TopK(object):
+    """
+    The k largest items of a stream by key.
+
+    >>> top = TopK(3, key=len)
+    >>> top.update(['a', 'abcd', 'ab', 'xyz', 'b', 'efgh'])
+    >>> top.result()
+    ['abcd', 'efgh', 'xyz']
+    """
+    def __init__(self, k, key=None):
+        if k < 1:
+            raise ValueError("k should be positive!")
+        self._k = k
+        self._key = key
+        self._heap = BinaryHeap(k)
+        self._count = 0
+
+    @property
+    def length(self):
+        return self._heap.length
+
+    def push(self, item):
+        self.update((item,))
+
+    def update(self, items):
+        """
+        Push all the items of an iterable, O(logk) for every item that goes in.
+        """
+        heap, k, key = self._heap, self._k, self._key
+        # once the heap is full it stays full, and the key of its root only
+        # changes by replaceMin, so it is kept in root_key
+        full = heap.length == k
+        root_key = heap.findMin()[0] if full else None
+        order = -self._count
+        for item in items:
+            item_key = item if key is None else key(item)
+            order -= 1
+            if full:
+                if item_key > root_key:
+                    # equal keys keep the earlier item, the root
+                    heap.replaceMin((item_key, order, item))
+                    root_key = heap.findMin()[0]
+            else:
+                heap.insert((item_key, order, item))
+                if heap.length == k:
+                    full, root_key = True, heap.findMin()[0]
+        self._count = -order
+
+    def merge(self, other):
+        """
+        Push the items of another TopK, e.g. of another part of the stream.
+        """
+        self.update(other.result())
+
+    def result(self):
+        """
+        Return the items, from the largest to the smallest.
+        """
+        # pop the entries in order and put them back, O(klogk)
+        heap = self._heap
+        entries = [heap.delMin() for i in xrange(heap.length)]
+        heap.insertElements(entries)
+        entries.reverse()
+        return [entry[2] for entry in entries]
+
+
+def heap_test():
+    import random
+    for length in (0, 1, 2, 10, 1000):
+        test_list = [random.randint(0, length) for i in xrange(length)]
+        test_heap = BinaryHeap.creat_from_list(test_list)
+        assert [test_heap.delMin() for i in xrange(length)] == sorted(test_list)
+        # small and large batches into a heap that has to grow
+        test_heap, left = BinaryHeap(1), []
+        for batch_length in (1, length, length / 10, 3, length * 2):
+            batch = [random.random() for i in xrange(batch_length)]
+            test_heap.insertElements(batch)
+            left.extend(batch)
+            assert test_heap.length == len(left) <= test_heap.maxsize
+            left.sort()
+            for i in xrange(len(left) / 3):
+                assert test_heap.delMin() == left.pop(0)
+        assert [test_heap.delMin() for i in xrange(test_heap.length)] == left
+    print "heap test passed!"
+
+
+def dary_test():
+    import random
+    for arity in (2, 3, 4, 16):
+        for length in (0, 1, 2, 10, 1000):
+            test_list = [random.randint(0, length) for i in xrange(length)]
+            test_heap = DaryHeap.creat_from_list(test_list, [-x for x in test_list],
+                                                 arity, 'l')
+            res = [test_heap.delMin() for i in xrange(length)]
+            assert res == [(x, -x) for x in sorted(test_list)]
+            test_heap, left = DaryHeap(arity), []
+            for i in xrange(length * 2):
+                if left and random.random() < 0.4:
+                    assert test_heap.delMin()[0] == left.pop(0)
+                else:
+                    x = random.random()
+                    test_heap.insert(x)
+                    left.append(x)
+                    left.sort()
+                assert test_heap.length == len(left)
+                if left:
+                    assert test_heap.findMin()[0] == left[0]
+    print "d-ary heap test passed!"
+
+
+def pairing_test():
+    import random
+    for length in (0, 1, 2, 10, 1000):
+        test_heap, other = PairingHeap(), PairingHeap()
+        handles = {}
+        for i in xrange(length):
+            heap = test_heap if i % 2 else other
+            handles[i] = heap.insert(random.randint(0, length), i)
+        test_heap.meld(other)
+        assert other.isEmpty and test_heap.length == length
+        priorities = dict((i, handle.priority) for i, handle in handles.iteritems())
+        for i in random.sample(xrange(length), length / 2):
+            priorities[i] -= random.randint(0, length)
+            test_heap.decrease_key(handles[i], priorities[i])
+        while not test_heap.isEmpty:
+            assert test_heap.findMin()[0] == min(priorities.itervalues())
+            priority, i = test_heap.delMin()
+            assert priorities.pop(i) == priority
+            # decrease one of the elements left
+            if priorities and random.random() < 0.3:
+                i = random.choice(priorities.keys())
+                priorities[i] = max(priorities[i] - random.randint(0, 5), priority)
+                test_heap.decrease_key(handles[i], priorities[i])
+        assert not priorities and test_heap.length == 0
+    print "pairing heap test passed!"
+
+
+def topk_test():
+    import cPickle as pickle
+    import random
+    for k in (1, 3, 100):
+        for length in (0, 1, 10, 1000):
+            test_list = [random.randint(0, 50) for i in xrange(length)]
+            top = TopK(k)
+            top.update(iter(test_list[:length/2]))
+            assert top.result() == sorted(test_list[:length/2], reverse=True)[:k]
+            top.update(iter(test_list[length/2:]))
+            assert top.result() == sorted(test_list, reverse=True)[:k]
+            assert top.length == min(k, length)
+            # items with equal keys are never compared, the earlier ones are kept
+            items = [(random.randint(0, 20), object()) for i in xrange(length)]
+            expected = sorted(items, key=lambda x: x[0], reverse=True)[:k]
+            top = TopK(k, key=lambda x: x[0])
+            for item in items:
+                top.push(item)
+            assert top.result() == expected
+            # merge the TopK of the parts, passed through pickle
+            parts = [TopK(k, key=abs) for i in xrange(3)]
+            test_list = [random.randint(-100, 100) for i in xrange(length)]
+            for i, x in enumerate(test_list):
+                parts[i % 3].push(x)
+            top = TopK(k, key=abs)
+            for part in parts:
+                top.merge(pickle.loads(pickle.dumps(part, 2)))
+            assert map(abs, top.result()) == sorted(map(abs, test_list), reverse=True)[:k]
+    print "top-k test passed!"
+
+
+def topk_benchmark(length=1000000, k=100):
+    """
+    Compare TopK with heapq.nlargest, putting all items into a BinaryHeap
+    and sorting all items.
+    """
+    import heapq
+    import random
+    from time import time
+    test_list = [random.random() for i in xrange(length)]
+    start = time()
+    top = TopK(k)
+    top.update(test_list)
+    print "TopK.update             %f" % (time() - start)
+    start = time()
+    heapq.nlargest(k, test_list)
+    print "heapq.nlargest          %f" % (time() - start)
+    start = time()
+    test_heap = BinaryHeap.creat_from_list([-x for x in test_list])
+    [-test_heap.delMin() for i in xrange(k)]
+    print "BinaryHeap of all       %f" % (time() - start)
+    start = time()
+    sorted(test_list, reverse=True)[:k]
+    print "sorted                  %f" % (time() - start)
+
+
+def dary_benchmark(length=1000000, arities=(2, 4, 8, 16)):
+    """
+    Time a push-heavy and a pop-heavy workload of DaryHeap for every arity.
+    """
+    import random
+    from time import time
+    test_list = [random.random() for i in xrange(length)]
+    print "d       push-heavy      pop-heavy"
+    for arity in arities:
+        test_heap = DaryHeap(arity)
+        start = time()
+        for i, priority in enumerate(test_list):
+            test_heap.insert(priority, i)
+            if i % 10 == 9:
+                test_heap.delMin()
+        push_time = time() - start
+        start = time()
+        test_heap = DaryHeap.creat_from_list(test_list, arity=arity)
+        for i in xrange(length):
+            test_heap.delMin()
+        print "%-7d %f        %f" % (arity, push_time, time() - start)
+    # BinaryHeap of the priorities only, for reference
+    test_heap = BinaryHeap()
+    start = time()
+    for i, priority in enumerate(test_list):
+        test_heap.insert(priority)
+        if i % 10 == 9:
+            test_heap.delMin()
+    push_time = time() - start
+    start = time()
+    test_heap = BinaryHeap.creat_from_list(test_list)
+    for i in xrange(length):
+        test_heap.delMin()
+    print "BinaryHeap %f     %f" % (push_time, time() - start)
+
+
+def build_benchmark(length=1000000, batches=10):
+    """
+    Compare building a heap by inserting one by one with creat_from_list,
+    and with insertElements of `batches` batches.
+    """
+    import random
+    from time import time
+    test_list = [random.random() for i in xrange(length)]
+    test_heap = BinaryHeap(length)
+    start = time()
+    for element in test_list:
+        test_heap.insert(element)
+    print "insert one by one       %f" % (time() - start)
+    start = time()
+    BinaryHeap.creat_from_list(test_list)
+    print "creat_from_list         %f" % (time() - start)
+    batch_length = length / batches
+    test_heap = BinaryHeap()
+    start = time()
+    for i in xrange(0, length, batch_length):
+        for element in test_list[i:i+batch_length]:
+            test_heap.insert(element)
+    print "%d batches one by one   %f" % (batches, time() - start)
+    test_heap = BinaryHeap()
+    start = time()
+    for i in xrange(0, length, batch_length):
+        test_heap.insertElements(test_list[i:i+batch_length])
+    print "%d batches insertElements %f" % (batches, time() - start)
+
+
+def snapshot_test():
+    import cPickle as pickle
+    import random
+    for test_list in ([], range(100), [random.random() for i in xrange(100)],
+                      [(random.random(), 'x') for i in xrange(100)]):
+        test_heap = BinaryHeap(len(test_list) + 10)
+        test_heap.insertElements(test_list)
+        expected = list(test_heap._elements)
+        for res in (BinaryHeap.restore(test_heap.snapshot()),
+                    pickle.loads(pickle.dumps(test_heap, 2))):
+            assert res._elements == expected
+            assert res.maxsize == test_heap.maxsize and res.length == test_heap.length
+            assert [res.delMin() for i in xrange(res.length)] == sorted(test_list)
+    print "snapshot test passed!"
+
+
+def snapshot_benchmark(length=1000000):
+    """
+    Compare pickling the __dict__ of the heap, which is what pickle does
+    without __reduce_ex__, with pickling by snapshot.
+    """
+    import random
+    test_heap = BinaryHeap(length)
+    test_heap.insertElements([random.random() for i in xrange(length)])
+    _packed.pickle_benchmark(test_heap)
+
+
 if __name__ == "__main__":
     import doctest, random
-    doctest.testmod()
\ No newline at end of file
+    doctest.testmod()
+    heap_test()
+    dary_test()
+    pairing_test()
+    topk_test()
+    snapshot_test()
+    # build_benchmark()
+    # dary_benchmark()
+    # topk_benchmark()
+    # snapshot_benchmark()
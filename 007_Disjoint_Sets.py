@@ -1,10 +1,26 @@
 # -*- coding: utf-8 -*-
 # Python 2
 """
+Snapshot:
+    snapshot() packs `_data` by pack_numbers of 022_Packed_Numbers.py. The
+    subclasses share it, restore builds the class it is called on.
+
+    snapshot_benchmark, 1000000 elements after 500000 random unions:
+        pickle of __dict__      size 4936023    dump 0.041447    load 0.047998
+        pickle by snapshot      size 4000047    dump 0.069965    load 0.025902
+    Packing costs more than cPickle writing the list. The load only builds
+    the ints back, there is nothing else in the set to build.
 """
 
+import imp
+import os
 from random import randint
-class BasicDisjointSet(object):
+
+_packed = imp.load_source('packed_numbers',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '022_Packed_Numbers.py'))
+
+
+class BasicDisjointSet(_packed.Snapshot):
     """
     Use a tree to represent each set, since each element
     in a tree has the same root. The name of a set is given
@@ -17,6 +33,16 @@ class BasicDisjointSet(object):
     def __init__(self, element_num):
         self._length = element_num
         self._data = [-1 for i in xrange(self._length)]
+    def snapshot(self):
+        """
+        Return the state of the set as (length, format, packed _data).
+        """
+        return (self._length,) + _packed.pack_numbers(self._data)
+
+    def __setstate__(self, state):
+        self._length = state[0]
+        self._data = _packed.unpack_numbers(state[1], state[2])
+
     def find(self, identity):
         """
         With path comprehension, recursively update all the nodes
@@ -109,7 +135,6 @@ class SmartUnionByHeight(BasicDisjointSet):
 
 
 
-
 def disjoint_set_test(class_name=BasicDisjointSet):
     def random_test(test_set):
         for i in xrange(5):
@@ -169,6 +194,41 @@ def disjoint_set_test(class_name=BasicDisjointSet):
                 assert count == -min(test_set._data)
             print "test_length == 100 passed!"
 
+def snapshot_test():
+    import cPickle as pickle
+    for class_name in (BasicDisjointSet, SmartUnionBySize, SmartUnionByHeight):
+        for length in (0, 1, 100):
+            test_set = class_name(length)
+            for i in xrange(length):
+                try:
+                    test_set.union(randint(0, length-1), randint(0, length-1))
+                except ValueError:
+                    pass
+            expected = list(test_set._data)
+            for res in (class_name.restore(test_set.snapshot()),
+                        pickle.loads(pickle.dumps(test_set, 2))):
+                assert type(res) is class_name
+                assert res._data == expected and res._length == length
+                assert [res.find(i) for i in xrange(length)] == \
+                       [test_set.find(i) for i in xrange(length)]
+    assert BasicDisjointSet(3).snapshot()[:2] == (3, '<i')
+    print "snapshot test passed!"
+
+
+def snapshot_benchmark(length=1000000):
+    """
+    Compare pickling the __dict__ of the set, which is what pickle does
+    without __reduce_ex__, with pickling by snapshot.
+    """
+    test_set = SmartUnionBySize(length)
+    for i in xrange(length / 2):
+        try:
+            test_set.union(randint(0, length-1), (i * 7919) % length)
+        except ValueError:
+            pass
+    _packed.pickle_benchmark(test_set)
+
+
 if __name__ == '__main__':
     test = BasicDisjointSet(10)
     for i in xrange(10):
@@ -180,4 +240,6 @@ if __name__ == '__main__':
     print test._data
     algorithms = [BasicDisjointSet,SmartUnionBySize,SmartUnionByHeight]
     for algor in algorithms:
-        disjoint_set_test(class_name=algor)
\ No newline at end of file
+        disjoint_set_test(class_name=algor)
+    snapshot_test()
+    # snapshot_benchmark()
\ No newline at end of file
@@ -1,3 +1,25 @@
+# Trie Tree
+#
+# Snapshot: snapshot() lists the nodes in preorder as three flat sequences, the
+#           chars as one string, the isWord flags as bytes and the number of
+#           children packed by pack_numbers of 022_Packed_Numbers.py, and
+#           restore(snapshot) links the nodes back with a stack of the nodes
+#           waiting for children. Pickling writes them instead of a TrieNode
+#           and a dict for every char.
+#
+#           snapshot_benchmark, 200000 random words of 3 to 12 chars:
+#               pickle of __dict__      size 32796936   dump 10.642799   load 11.057087
+#               pickle by snapshot      size 5336689    dump 1.100087    load 5.923628
+#           Most of the load time is building the TrieNode objects again.
+#
+
+import imp
+import os
+
+_packed = imp.load_source('packed_numbers',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '022_Packed_Numbers.py'))
+
+
 class TrieNode(object):
     def __init__(self, char):
         self.val = char
@@ -10,7 +32,7 @@ class TrieNode(object):
     def child_list(self):
         return self.diction.keys()
 
-class TrieTree(object):
+class TrieTree(_packed.Snapshot):
     def __init__(self):
         self.root = TrieNode('dummy')
     def insert(self, word):
@@ -46,6 +68,41 @@ class TrieTree(object):
     def display_tree(self):
         this_node = self.root
 
+    def snapshot(self):
+        """
+        Return the state of the tree as (chars, isWord flags, format, packed
+        child counts) of the nodes in preorder, the root only has its child count.
+        """
+        chars, flags, counts = [], bytearray(), []
+        stack = [self.root]
+        while stack:
+            this_node = stack.pop()
+            if this_node is not self.root:
+                chars.append(this_node.val)
+                flags.append(this_node.isWord)
+            children = this_node.diction.values()
+            counts.append(len(children))
+            stack.extend(children)
+        if all(isinstance(ch, basestring) and len(ch) == 1 for ch in chars):
+            chars = ''.join(chars)
+        return (chars, str(flags)) + _packed.pack_numbers(counts)
+
+    def __setstate__(self, state):
+        chars, flags = state[0], bytearray(state[1])
+        counts = _packed.unpack_numbers(state[2], state[3])
+        self.root = TrieNode('dummy')
+        # [node, the number of children not linked yet]
+        pending = [[self.root, counts[0]]]
+        for idx, ch in enumerate(chars):
+            while not pending[-1][1]:
+                pending.pop()
+            parent = pending[-1]
+            parent[1] -= 1
+            this_node = TrieNode(ch)
+            this_node.isWord = bool(flags[idx])
+            parent[0].diction[ch] = this_node
+            pending.append([this_node, counts[idx+1]])
+
 
 def permutation(test, length):
     def helper(ans, index):
@@ -68,7 +125,46 @@ def my_test(dictionary, testchar, length):
     #     print test, mytree.find_prefix(test)
 
 
+def snapshot_test():
+    import cPickle as pickle
+    import random
+    for words in ([], ['a'], ['qwre', 'qwrw', 'qq', 'q', 'eere'],
+                  [''.join(random.choice('abc') for i in xrange(random.randint(1, 8)))
+                   for j in xrange(300)],
+                  [(1, 2), (1, 3, 4), (5,)]):
+        mytree = TrieTree()
+        for word in words:
+            mytree.insert(word)
+        for res in (TrieTree.restore(mytree.snapshot()), pickle.loads(pickle.dumps(mytree, 2))):
+            for word in words:
+                assert res.find_word(word)
+                assert res.find_prefix(word[:-1])
+            for word in permutation('abcq', 3):
+                assert res.find_word(word) == mytree.find_word(word)
+                assert res.find_prefix(word) == mytree.find_prefix(word)
+    mytree = TrieTree()
+    mytree.insert('ab')
+    assert mytree.snapshot()[:3] == ('ab', '\x00\x01', '<i')
+    print "snapshot test passed!"
+
+
+def snapshot_benchmark(length=200000):
+    """
+    Compare pickling the __dict__ of the tree, which is what pickle does
+    without __reduce_ex__, with pickling by snapshot.
+    """
+    import random
+    import string
+    mytree = TrieTree()
+    for i in xrange(length):
+        mytree.insert(''.join(random.choice(string.ascii_lowercase)
+                              for j in xrange(random.randint(3, 12))))
+    _packed.pickle_benchmark(mytree)
+
+
 if __name__ == '__main__':
     dictionary = ['qwre','qwrw','qqrq','eere','qqrw','eerw','wwrq','wwww','qweq']
     test_char = 'qwer'
-    my_test(dictionary, test_char, 3)
\ No newline at end of file
+    my_test(dictionary, test_char, 3)
+    snapshot_test()
+    # snapshot_benchmark()
\ No newline at end of file
@@ -20,8 +20,23 @@
 #   2. update_node
 #   3. query
 #   4. add_node
+#
+# Snapshot:
+#   snapshot() packs _data by pack_numbers of 022_Packed_Numbers.py, and pickling
+#   writes the snapshot instead of the list of N sums.
+#
+#   snapshot_benchmark, 1000000 random ints:
+#       pickle of __dict__      size 4870598    dump 0.035290    load 0.060969
+#       pickle by snapshot      size 4000046    dump 0.050545    load 0.022880
+#   cPickle already writes a list of small ints fast, so the dump is slower.
+#   The sums are all the load has to build, which is why it is quicker here.
 
 # from tree_representation import Tree
+import imp
+import os
+
+_packed = imp.load_source('packed_numbers',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '022_Packed_Numbers.py'))
 
 """
 For a tree_index == 0b_1100_1011_1101_0010_1000 total 10 high bits,
@@ -31,7 +46,7 @@ This node's next's index is   0b_1100_1011_1101_0011_0000 - by combining the las
 This node's value is the sum of original[0b_1100_1011_1101_0010_0000] to original[0b_1100_1011_1101_0010_0111] 
 """
 
-class FenwickTree(object):
+class FenwickTree(_packed.Snapshot):
     def __init__(self, size):
         """
         Init a Fenwick Tree by assuming the original data are all 0s
@@ -94,6 +109,20 @@ class FenwickTree(object):
         delta = value - get_index(i)
         self.update_index_by_delta(i, delta)
 
+    def snapshot(self):
+        """
+        Return the state of the tree as (size, format, packed _data).
+
+        >>> a = FenwickTree.create_from_list([3, 1, 4])
+        >>> FenwickTree.restore(a.snapshot())._data == a._data
+        True
+        """
+        return (self._size,) + _packed.pack_numbers(self._data)
+
+    def __setstate__(self, state):
+        self._size = state[0]
+        self._data = _packed.unpack_numbers(state[1], state[2])
+
     def get_parent(self, tree_index):
         """
         Given a tree_index, return the tree_index of its parent.
@@ -127,8 +156,35 @@ def fenwickTree_test():
         for j in xrange(i, 1000):
             assert fenwickTree.query_sum(i, j) == ((i+j+2) * (j-i+1))/2
 
+def snapshot_test():
+    import cPickle as pickle
+    for nums in ([], range(1, 100), [0.5 * i for i in xrange(100)], [1, 2**70, 3]):
+        tree = FenwickTree.create_from_list(nums)
+        for res in (FenwickTree.restore(tree.snapshot()),
+                    pickle.loads(pickle.dumps(tree, 2))):
+            assert res._data == tree._data and res._size == tree._size
+            assert [res.get_index(i) for i in xrange(len(nums))] == nums
+    assert FenwickTree.create_from_list([1, 2]).snapshot()[:2] == (2, '<i')
+    print "snapshot test passed!"
+
+
+def snapshot_benchmark(length=1000000):
+    """
+    Compare pickling the __dict__ of the tree, which is what pickle does
+    without __reduce_ex__, with pickling by snapshot.
+    """
+    import random
+    tree = FenwickTree(length)
+    tree._data = [random.randint(0, 10**6) for i in xrange(length + 1)]
+    _packed.pickle_benchmark(tree)
+
+
 if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+    snapshot_test()
     # fenwickTree_test()
+    # snapshot_benchmark()
     a = FenwickTree.create_from_list(range(1, 16))
     print a._data
 
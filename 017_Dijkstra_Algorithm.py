@@ -13,6 +13,38 @@
 #      values, iterate through all adjacent vertices. For every adjacent vertex v,
 #      if sum of distance value of u (from source) and weight of edge u-v, is less
 #      than the distance value of v, then update the distance value of v.
+#
+# Heap: By default (distance, v) is pushed into heapq for every unvisited
+#       neighbor v of a popped vertex, and a vertex is expanded again every
+#       time one of its entries is popped, so the heap grows far beyond E.
+#       With `heap_class`, e.g. PairingHeap of 005_Binary_Heap.py, every vertex
+#       has one handle in the heap and an update calls decrease_key, so the
+#       heap never holds more than V entries. dijkstra_lazy is the usual heapq
+#       version to compare with: it pushes a vertex again for every shorter
+#       distance and skips the entries of a vertex popped before, so the heap
+#       holds at most E entries.
+#
+#       dijkstra_benchmark, random graphs with weights from 1 to 100:
+#           graph                   heap            max heap size   time
+#              40 V, 0.300 density  heapq           14198           0.177729
+#                                   heapq lazy      49              0.000240
+#                                   PairingHeap     31              0.000421
+#             200 V, 0.050 density  heapq           73381           0.889549
+#                                   heapq lazy      238             0.000758
+#                                   PairingHeap     138             0.001583
+#            3000 V, 0.002 density  heapq           60427           0.592404
+#                                   heapq lazy      2419            0.013481
+#                                   PairingHeap     1602            0.032536
+#            2000 V, 0.100 density  heapq lazy      7380            0.095046
+#                                   PairingHeap     1939            0.109097
+#           20000 V, 0.001 density  heapq lazy      36852           0.373998
+#                                   PairingHeap     16007           0.782462
+#       The default path expands a vertex again for every entry of it, so it
+#       could not finish 1000 V at 0.2 density here. Against heapq with lazy
+#       deletion, PairingHeap keeps the heap 1.5 to 4 times smaller but runs
+#       1.1 to 2.4 times slower: heappush and heappop run in C, while
+#       decrease_key and delMin run in Python.
+#
 
 import heapq
 class Graph(object):
@@ -36,7 +68,16 @@ class Graph(object):
             graph[dest] = graph.get(dest, set())
         return "%s" % graph
 
-def dijkstra(graph, src):
+def dijkstra(graph, src, heap_class=None, stats=None):
+    """
+    Return the list of the distances from src.
+    heap_class: None for heapq with duplicates, or a heap class with insert,
+                delMin, decrease_key, isEmpty and length, such as PairingHeap
+    stats: if a dict is given, stats['max_heap'] is set to the max heap size
+    """
+    if heap_class is not None:
+        return _dijkstra_decrease_key(graph, src, heap_class, stats)
+    max_heap = 1
     visited = {src}
     distance = [float("inf")] * graph.vertices
     distance[src] = 0
@@ -48,8 +89,106 @@ def dijkstra(graph, src):
             if neighbor not in visited:
                 heapq.heappush(heap, (distance[neighbor], neighbor))
         visited.add(thisNode)
+        max_heap = max(max_heap, len(heap))
+    if stats is not None:
+        stats['max_heap'] = max_heap
     return distance
 
+def dijkstra_lazy(graph, src, stats=None):
+    """
+    Return the list of the distances from src by heapq with lazy deletion.
+    stats: if a dict is given, stats['max_heap'] is set to the max heap size
+    """
+    max_heap = 1
+    visited = set()
+    distance = [float("inf")] * graph.vertices
+    distance[src] = 0
+    heap = [(0, src)]
+    while heap:
+        dist, thisNode = heapq.heappop(heap)
+        if thisNode in visited:
+            continue
+        visited.add(thisNode)
+        for neighbor, cost in graph.getNeighbors(thisNode):
+            if dist + cost < distance[neighbor]:
+                distance[neighbor] = dist + cost
+                heapq.heappush(heap, (dist + cost, neighbor))
+        max_heap = max(max_heap, len(heap))
+    if stats is not None:
+        stats['max_heap'] = max_heap
+    return distance
+
+def _dijkstra_decrease_key(graph, src, heap_class, stats):
+    distance = [float("inf")] * graph.vertices
+    distance[src] = 0
+    heap = heap_class()
+    # the handle of every vertex that has been in the heap
+    handles = [None] * graph.vertices
+    handles[src] = heap.insert(0, src)
+    max_heap = 1
+    while not heap.isEmpty:
+        dist, thisNode = heap.delMin()
+        for neighbor, cost in graph.getNeighbors(thisNode):
+            if dist + cost < distance[neighbor]:
+                distance[neighbor] = dist + cost
+                # a vertex already deleted from the heap has its final distance,
+                # so a shorter one is only found for a vertex in the heap
+                if handles[neighbor] is None:
+                    handles[neighbor] = heap.insert(dist + cost, neighbor)
+                else:
+                    heap.decrease_key(handles[neighbor], dist + cost)
+        max_heap = max(max_heap, heap.length)
+    if stats is not None:
+        stats['max_heap'] = max_heap
+    return distance
+
+def _load_heap_module():
+    import imp, os
+    return imp.load_source('heap_module',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), '005_Binary_Heap.py'))
+
+def random_graph(vertexNum, density):
+    import random
+    graph = Graph(vertexNum)
+    for src in xrange(vertexNum):
+        for dest in xrange(src + 1, vertexNum):
+            if random.random() < density:
+                graph.addEdge(src, dest, random.randint(1, 100))
+    return graph
+
+def dijkstra_test():
+    heap_module = _load_heap_module()
+    for vertexNum, density in ((1, 0), (10, 0.3), (200, 0.02), (30, 0.3)):
+        graph = random_graph(vertexNum, density)
+        for src in xrange(0, vertexNum, 7):
+            expected = dijkstra(graph, src)
+            assert dijkstra_lazy(graph, src) == expected
+            assert dijkstra(graph, src, heap_module.PairingHeap) == expected
+    print "dijkstra test passed!"
+
+def dijkstra_benchmark(graphs=((40, 0.3), (200, 0.05), (3000, 0.002)),
+                       large_graphs=((2000, 0.1), (20000, 0.001))):
+    """
+    Compare the max heap size and the time of heapq with duplicates, heapq
+    with lazy deletion and PairingHeap with decrease_key. Heapq with
+    duplicates is left out on large_graphs, it doesn't finish them.
+    """
+    from time import time
+    heap_module = _load_heap_module()
+    pairing = lambda graph, src, stats: dijkstra(graph, src, heap_module.PairingHeap, stats)
+    print "graph                   heap            max heap size   time"
+    for vertexNum, density in graphs + large_graphs:
+        graph = random_graph(vertexNum, density)
+        runs = [("heapq lazy", dijkstra_lazy), ("PairingHeap", pairing)]
+        if (vertexNum, density) not in large_graphs:
+            runs.insert(0, ("heapq", dijkstra))
+        for name, run in runs:
+            stats = {}
+            start = time()
+            run(graph, 0, stats=stats)
+            print "%5d V, %.3f density  %-15s %-15d %f" % (
+                vertexNum, density, name, stats['max_heap'], time() - start)
+
 if __name__ == '__main__':
     graph = Graph(9)
     graph.addEdge(0, 1, 4)
@@ -67,3 +206,5 @@ if __name__ == '__main__':
     graph.addEdge(2, 5, 4)
     graph.addEdge(3, 5, 14)
     print dijkstra(graph, 0)
+    dijkstra_test()
+    # dijkstra_benchmark()
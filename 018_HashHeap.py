@@ -7,8 +7,26 @@
 # 
 # Basic automatic tests are given in `pushpopTest()` and `removeTest()`.
 # Note: It may takes about 10 seconds to run both test functions.
+#
+# Snapshot: snapshot() packs the values and the counts of the heap nodes by
+# pack_numbers of 022_Packed_Numbers.py, and restore(snapshot) builds the nodes
+# and `_hashMap` back from them, so pickling writes two strings instead of one
+# object per HeapNode.
+#
+# snapshotBenchmark, 1000000 distinct random ints:
+#       pickle of __dict__      size 38845813   dump 7.620768    load 2.412566
+#       pickle by snapshot      size 8000047    dump 0.484975    load 3.216086
+# The load is slower than unpickling the objects: the values go through
+# array.tolist() and then every HeapNode and `_hashMap` is built again. The
+# gain is only the dump time and the size.
 
+import imp
+import os
 import random
+from itertools import izip
+
+_packed = imp.load_source('packed_numbers',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '022_Packed_Numbers.py'))
 
 class HeapNode(object):
     """
@@ -27,7 +45,7 @@ class HeapNode(object):
         return "[%s, %d]" % (self.val, self.cnt)
     __repr__ = __str__
 
-class HashHeap(object):
+class HashHeap(_packed.Snapshot):
     """
     This HashHeap is the same as the list implementation of binary heap, but with
     a hashMap to map the value of one elemnt to its index in the list.
@@ -177,6 +195,22 @@ class HashHeap(object):
         idx = self._hashMap[elem]
         self._removeByIdx(idx)
 
+    def snapshot(self):
+        """
+        Return the state of the heap as
+        (length, format, packed values, format, packed counts)
+        """
+        return ((self._cap,) + _packed.pack_numbers([node.val for node in self._data]) +
+                _packed.pack_numbers([node.cnt for node in self._data]))
+
+    def __setstate__(self, state):
+        values = _packed.unpack_numbers(state[1], state[2])
+        counts = _packed.unpack_numbers(state[3], state[4])
+        self._cap = state[0]
+        self._maxIdx = len(values) - 1
+        self._data = map(HeapNode, values, counts)
+        self._hashMap = dict(izip(values, xrange(len(values))))
+
     def __contains__(self, value):
         return value in self._hashMap
 
@@ -238,6 +272,34 @@ def removeTest():
             assert len(thisHeap._hashMap) == thisHeap._maxIdx + 1
 
 
+def snapshotTest():
+    """
+    Restore the heap from its snapshot and by pickle, then pop all the elements.
+    """
+    import cPickle as pickle
+    for testList in ([0], [random.randrange(-100, 100) for i in xrange(500)],
+                     [random.randrange(-2**40, 2**40) for i in xrange(500)]):
+        thisHeap = HashHeap(testList)
+        for res in (HashHeap.restore(thisHeap.snapshot()),
+                    pickle.loads(pickle.dumps(thisHeap, 2))):
+            assert res.length == thisHeap.length
+            assert len(res._hashMap) == res._maxIdx + 1
+            assert all(res._hashMap[node.val] == idx for idx, node in enumerate(res._data))
+            assert [res.heapPop() for i in xrange(res.length)] == sorted(testList)
+    assert HashHeap([2**40]).snapshot()[1::2] == ('<q', '<i')
+
+
+def snapshotBenchmark(length=1000000):
+    """
+    Compare pickling the __dict__ of the heap, which is what pickle does
+    without __reduce_ex__, with pickling by snapshot.
+    """
+    thisHeap = HashHeap(random.sample(xrange(length * 10), length))
+    _packed.pickle_benchmark(thisHeap)
+
+
 if __name__ == '__main__':
     pushpopTest()
-    removeTest()
\ No newline at end of file
+    removeTest()
+    snapshotTest()
+    # snapshotBenchmark()
\ No newline at end of file
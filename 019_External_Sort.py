@@ -0,0 +1,302 @@
+# External Sort in 'Data Structure and Algorithm Analysis' P.249
+#
+# Condition: The file to be sorted is larger than the main memory.
+#
+# External Sort: Read the input in chunks that fit in the memory budget, sort
+#                every chunk in memory and spill it to a temp file as a sorted
+#                run. Then merge the runs with a heap: the heap holds the head
+#                of every run, pop the smallest record, output it and push the
+#                next record of the same run. This is a k-way merge.
+#                Time complexity is O(NlogN), each record is read and written
+#                O(log_k(N/M)) times.
+#
+# Memory budget:
+#       Sorting:    A chunk is read until its estimated size reaches
+#                   `memory_limit`. The size of a record is estimated by
+#                   sys.getsizeof of the record plus one pointer slot of the
+#                   list. With `key`, the key of every record is computed once
+#                   while reading and kept in a parallel list, and the chunk is
+#                   sorted as a list of indices by those keys, so the key and
+#                   the index are counted too.
+#       Merging:    Every run is read through a buffer of
+#                   memory_limit / (fan_in + 1) bytes. If there are more runs
+#                   than `fan_in`, groups of runs are merged into longer runs
+#                   first, so the number of open files stays bounded.
+#
+# File formats:
+#       Text:       One record per line, records are the lines without '\n'.
+#                   Use key=int to sort a file of integers.
+#       Binary:     Fixed-width numbers as written by array.tofile, given by
+#                   the array typecode ('i', 'I', 'l', 'L', 'd' ...).
+#
+# iter_external_sort streams the sorted records as a generator.
+# external_sort writes them to an output file.
+#
+# Any in-place sort of a list could be used for the chunks, e.g. quick_sort in
+# 006_Sort.py or radix_sort in 000_Radix_sort.py, by `chunk_sort`. list.sort
+# is used by default.
+#
+# external_benchmark: 1000000 random 32-bit integers (4MB binary file) with an
+# 8MB budget are sorted in 2.318563 seconds.
+
+import heapq
+import os
+import shutil
+import sys
+import tempfile
+from array import array
+from itertools import imap
+
+
+def iter_external_sort(in_path, memory_limit=64 << 20, typecode=None, key=None,
+                       chunk_sort=None, fan_in=64, tmp_dir=None):
+    """
+    Generator of the records of `in_path` in sorted order.
+    : type in_path: str, the file to be sorted
+    : type memory_limit: int, the memory budget in bytes
+    : type typecode: str, array typecode of a binary file, None for text
+    : type key: callable, evaluated once per record
+    : type chunk_sort: callable sorting a list in place, used when key is None
+    : type fan_in: int, the max number of runs merged at once
+    : rtype: generator
+    """
+    if memory_limit <= 0:
+        raise ValueError("memory_limit should be positive!")
+    if fan_in < 2:
+        raise ValueError("fan_in should be at least 2!")
+    work_dir = tempfile.mkdtemp(prefix='external_sort_', dir=tmp_dir)
+    try:
+        runs = []
+        for chunk, keys in _read_chunks(in_path, memory_limit, typecode, key):
+            if keys is not None:
+                # sort the indices by the keys computed while reading, so
+                # that key is called only once per record
+                order = sorted(xrange(len(chunk)), key=keys.__getitem__)
+                records = imap(chunk.__getitem__, order)
+            elif chunk_sort is not None:
+                chunk_sort(chunk)
+                records = chunk
+            else:
+                chunk.sort()
+                records = chunk
+            run_path = os.path.join(work_dir, 'run_%d' % len(runs))
+            _write_run(run_path, records, typecode)
+            runs.append(run_path)
+            del chunk, keys, records
+
+        buffer_size = max(memory_limit / (fan_in + 1), 4096)
+        # merge groups of runs until one merge pass is enough
+        while len(runs) > fan_in:
+            merged = []
+            for i in xrange(0, len(runs), fan_in):
+                group = runs[i:i+fan_in]
+                run_path = os.path.join(work_dir, 'run_%d_%d' % (len(runs), i))
+                _write_run(run_path,
+                           _merge_runs(group, typecode, key, buffer_size),
+                           typecode)
+                for path in group:
+                    os.remove(path)
+                merged.append(run_path)
+            runs = merged
+
+        for record in _merge_runs(runs, typecode, key, buffer_size):
+            yield record
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def external_sort(in_path, out_path, memory_limit=64 << 20, typecode=None,
+                  key=None, chunk_sort=None, fan_in=64, tmp_dir=None):
+    """
+    Sort `in_path` into `out_path` in the same format.
+    Parameters are the same as iter_external_sort.
+    """
+    records = iter_external_sort(in_path, memory_limit, typecode, key,
+                                 chunk_sort, fan_in, tmp_dir)
+    _write_run(out_path, records, typecode)
+
+
+def _read_chunks(in_path, memory_limit, typecode, key):
+    """
+    Yield (records, keys) of chunks whose estimated size is within
+    memory_limit, keys is the list of key(record) or None if key is None.
+    """
+    # an index of the sorted order and its slot in the list
+    index_size = sys.getsizeof(0) + 8
+    if typecode is not None:
+        record_size = sys.getsizeof(array(typecode, [0]).tolist()[0]) + 8
+        if key is not None:
+            # the key of about the same size as the record, and the index
+            record_size = record_size * 2 + index_size
+        chunk_len = max(memory_limit / record_size, 1)
+        with open(in_path, 'rb') as in_file:
+            while True:
+                chunk = array(typecode)
+                try:
+                    chunk.fromfile(in_file, chunk_len)
+                except EOFError:
+                    # the last chunk is shorter, fromfile keeps what it read
+                    pass
+                if not chunk:
+                    return
+                records = chunk.tolist()
+                yield records, map(key, records) if key is not None else None
+                if len(chunk) < chunk_len:
+                    return
+    else:
+        with open(in_path, 'rb') as in_file:
+            chunk, size = [], 0
+            keys = [] if key is not None else None
+            for line in in_file:
+                record = line[:-1] if line.endswith('\n') else line
+                chunk.append(record)
+                size += sys.getsizeof(record) + 8
+                if keys is not None:
+                    record_key = key(record)
+                    keys.append(record_key)
+                    size += sys.getsizeof(record_key) + 8 + index_size
+                if size >= memory_limit:
+                    yield chunk, keys
+                    chunk, size = [], 0
+                    keys = [] if key is not None else None
+            if chunk:
+                yield chunk, keys
+
+
+def _write_run(path, records, typecode, block_len=8192):
+    """
+    Write an iterable of records to `path` with buffered block writes.
+    """
+    with open(path, 'wb') as out_file:
+        if typecode is not None:
+            block = array(typecode)
+            for record in records:
+                block.append(record)
+                if len(block) >= block_len:
+                    block.tofile(out_file)
+                    block = array(typecode)
+            block.tofile(out_file)
+        else:
+            out_file.writelines(record + '\n' for record in records)
+
+
+def _iter_run(path, typecode, buffer_size):
+    """
+    Generator of the records of one run, read `buffer_size` bytes at a time.
+    """
+    with open(path, 'rb', buffer_size) as in_file:
+        if typecode is not None:
+            block_len = max(buffer_size / array(typecode).itemsize, 1)
+            while True:
+                block = array(typecode)
+                try:
+                    block.fromfile(in_file, block_len)
+                except EOFError:
+                    pass
+                for record in block:
+                    yield record
+                if len(block) < block_len:
+                    return
+        else:
+            for line in in_file:
+                yield line[:-1]
+
+
+def _merge_runs(paths, typecode, key, buffer_size):
+    """
+    k-way merge of sorted runs with a heap. The heap entries are
+    (key, run index, record), so equal keys keep the order of the runs and
+    the merge is stable.
+    """
+    readers = [_iter_run(path, typecode, buffer_size) for path in paths]
+    heap = []
+    for idx, reader in enumerate(readers):
+        for record in reader:
+            heap.append((key(record) if key else record, idx, record))
+            break
+    heapq.heapify(heap)
+    while heap:
+        _, idx, record = heap[0]
+        yield record
+        for record in readers[idx]:
+            heapq.heapreplace(heap, (key(record) if key else record, idx, record))
+            break
+        else:
+            heapq.heappop(heap)
+
+
+# ===========================
+#  TEST-concerning
+# ===========================
+def external_sort_test():
+    from random import randint, choice
+    work_dir = tempfile.mkdtemp()
+    try:
+        in_path = os.path.join(work_dir, 'in')
+        out_path = os.path.join(work_dir, 'out')
+        # binary integers, tiny budget to get many runs and several merge passes
+        for length in (0, 1, 1000, 20000):
+            test = array('i', [randint(-10**9, 10**9) for i in xrange(length)])
+            with open(in_path, 'wb') as in_file:
+                test.tofile(in_file)
+            external_sort(in_path, out_path, memory_limit=8192, typecode='i', fan_in=4)
+            res = array('i')
+            with open(out_path, 'rb') as out_file:
+                res.fromstring(out_file.read())
+            assert res.tolist() == sorted(test)
+            assert list(iter_external_sort(in_path, 1 << 20, 'i')) == sorted(test)
+        # text integers and text records
+        test = [str(randint(-1000, 1000)) for i in xrange(5000)]
+        with open(in_path, 'wb') as in_file:
+            in_file.write('\n'.join(test))
+        external_sort(in_path, out_path, memory_limit=4096, key=int, fan_in=3)
+        with open(out_path, 'rb') as out_file:
+            assert out_file.read().split('\n')[:-1] == sorted(test, key=int)
+        test = ['%s,%d' % (choice('abcde'), i) for i in xrange(5000)]
+        with open(in_path, 'wb') as in_file:
+            in_file.write('\n'.join(test) + '\n')
+        res = list(iter_external_sort(in_path, 4096, key=lambda x: x[0]))
+        assert res == sorted(test, key=lambda x: x[0])
+        # key is called once per record while sorting the chunks, and once
+        # per record in the single merge pass
+        calls = [0]
+        def counted_key(record):
+            calls[0] += 1
+            return record[0]
+        def counted_negative(record):
+            calls[0] += 1
+            return -record
+        res = list(iter_external_sort(in_path, 1 << 16, key=counted_key))
+        assert res == sorted(test, key=lambda x: x[0]) and calls[0] == 2 * len(test)
+        test = array('i', [randint(-1000, 1000) for i in xrange(5000)])
+        with open(in_path, 'wb') as in_file:
+            test.tofile(in_file)
+        calls[0] = 0
+        res = list(iter_external_sort(in_path, 1 << 16, 'i', key=counted_negative))
+        assert res == sorted(test, reverse=True) and calls[0] == 2 * len(test)
+        print "external sort test passed!"
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def external_benchmark(length=1000000, memory_limit=8 << 20):
+    """
+    Sort a binary file of `length` random 32-bit integers within memory_limit.
+    """
+    from random import randint
+    from time import time
+    work_dir = tempfile.mkdtemp()
+    try:
+        in_path = os.path.join(work_dir, 'in')
+        with open(in_path, 'wb') as in_file:
+            array('I', [randint(0, 2**32-1) for i in xrange(length)]).tofile(in_file)
+        start = time()
+        external_sort(in_path, os.path.join(work_dir, 'out'), memory_limit, 'I')
+        print "%d integers sorted with %d bytes in %f seconds" % (length, memory_limit, time()-start)
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    external_sort_test()
+    # external_benchmark()
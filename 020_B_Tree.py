@@ -0,0 +1,412 @@
+# B-Tree in 'Data Structure and Algorithm Analysis' 4.7
+#
+# Keypoint: A node keeps up to `fanout` items (leaf) or `fanout` children
+#           (internal node) in plain Python lists. The items of the tree are
+#           all kept in the leaves, as the B-Tree of the book, and an internal
+#           node keeps the keys to choose the child:
+#               items of children[i] < keys[i] <= items of children[i+1]
+#           Inside one node the position is found by bisect, which runs in C,
+#           so a lookup only follows log_fanout(N) pointers instead of
+#           about 1.44*log2(N) nodes of AVL, and one key costs one slot of a
+#           list instead of a whole object with `val`, `left` and `right`.
+#
+# Insertion: Insert the item into its leaf. If the leaf has more than `fanout`
+#           items, split it into two halves and add the key of the right half
+#           to the parent, which may split the same way up to the root.
+#           The key should be strictly larger than the items of the left half,
+#           so the split point moves away from a run of equal items. A leaf
+#           full of one item could not be split, it just grows.
+#
+# Deletion: Remove the item from its leaf. If a node has less than fanout / 2
+#           items or children, it is merged with its sibling, or if they are
+#           too many for one node, the items of both are split again evenly.
+#           If the root is left with one child, the child is the new root.
+#
+# Interface: find, insert, delete, findMin and findMax as AVL (003) does. The
+#           items are not kept in nodes of their own, so find, findMin and
+#           findMax wrap the item found in a _BItem whose `val` is the item,
+#           as `val` of an AVL node, or return None. insert and delete change
+#           the tree in place and return it, so `tree = tree.insert(x)` works
+#           the same as for AVL.
+#
+# btree_benchmark, 1000000 random floats, memory per key counts the tree
+# structure only (sys.getsizeof of nodes, __dict__ and lists), not the keys,
+# find/s of BTree includes building the _BItem it returns:
+#
+#   tree            bytes/key   insert/s    find/s      delete/s
+#   BTree(64)           12.6     205538      205645      161458
+#   BTree(256)           9.5     226370      232205      195264
+#   BST (002)          344.0      35643       80323       48411
+#   AVL (003)          344.0      12253       84601       12078
+#
+
+from bisect import bisect_left, bisect_right, insort_right
+
+
+class _BNode(object):
+    """
+    keys: the items of a leaf, or the keys of an internal node
+    children: None for a leaf
+    """
+    __slots__ = ('keys', 'children')
+
+    def __init__(self, keys, children=None):
+        self.keys = keys
+        self.children = children
+
+
+class _BItem(object):
+    """
+    val: an item found in the tree
+    """
+    __slots__ = ('val',)
+
+    def __init__(self, val):
+        self.val = val
+
+
+class BTree(object):
+    def __init__(self, fanout=64):
+        if fanout < 4:
+            raise ValueError("fanout should be at least 4!")
+        self._fanout = fanout
+        self._root = _BNode([])
+        self._size = 0
+
+    @classmethod
+    def createFromList(cls, in_list, fanout=64):
+        tree = cls(fanout)
+        for item in in_list:
+            tree.insert(item)
+        return tree
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node.children is None:
+                for item in node.keys:
+                    yield item
+            else:
+                stack.extend(reversed(node.children))
+
+    def _leaf(self, match):
+        """
+        Return the leaf where match should be.
+        """
+        node = self._root
+        while node.children is not None:
+            node = node.children[bisect_right(node.keys, match)]
+        return node
+
+    def find(self, match):
+        """
+        find item in the B-Tree, return None if not found
+
+        >>> tree = BTree.createFromList([5, 0, 8], fanout=4)
+        >>> tree.find(0).val, tree.find(4)
+        (0, None)
+        """
+        keys = self._leaf(match).keys
+        idx = bisect_left(keys, match)
+        if idx < len(keys) and keys[idx] == match:
+            return _BItem(keys[idx])
+        return None
+
+    def findMin(self):
+        """
+        return the smallest item, None if the tree is empty
+        """
+        node = self._root
+        while node.children is not None:
+            node = node.children[0]
+        return _BItem(node.keys[0]) if node.keys else None
+
+    def findMax(self):
+        """
+        return the largest item, None if the tree is empty
+        """
+        node = self._root
+        while node.children is not None:
+            node = node.children[-1]
+        return _BItem(node.keys[-1]) if node.keys else None
+
+    def insert(self, content):
+        """
+        Insert content, duplicates are kept.
+
+        >>> tree = BTree(fanout=4)
+        >>> for x in [5, 1, 9, 3, 7, 2, 8, 5]:
+        ...     tree = tree.insert(x)
+        >>> list(tree), tree.findMin().val, tree.findMax().val
+        ([1, 2, 3, 5, 5, 7, 8, 9], 1, 9)
+        """
+        path, node = [], self._root
+        while node.children is not None:
+            idx = bisect_right(node.keys, content)
+            path.append((node, idx))
+            node = node.children[idx]
+        insort_right(node.keys, content)
+        self._size += 1
+        # split the overflowed nodes on the way back to the root
+        while self._length(node) > self._fanout:
+            key, right = self._split(node)
+            if right is None:
+                break
+            if path:
+                node, idx = path.pop()
+                node.keys.insert(idx, key)
+                node.children.insert(idx + 1, right)
+            else:
+                self._root = _BNode([key], [node, right])
+                break
+        return self
+
+    def delete(self, match):
+        """
+        Delete one item equal to match, raise ValueError if not found.
+
+        >>> tree = BTree.createFromList(range(20), fanout=4)
+        >>> for x in range(0, 20, 2):
+        ...     tree = tree.delete(x)
+        >>> list(tree)
+        [1, 3, 5, 7, 9, 11, 13, 15, 17, 19]
+        """
+        path, node = [], self._root
+        while node.children is not None:
+            idx = bisect_right(node.keys, match)
+            path.append((node, idx))
+            node = node.children[idx]
+        idx = bisect_left(node.keys, match)
+        if idx == len(node.keys) or node.keys[idx] != match:
+            raise ValueError("deletion node not found!!")
+        del node.keys[idx]
+        self._size -= 1
+        # fix the underflowed nodes on the way back to the root
+        min_len = self._fanout / 2
+        while path:
+            if self._length(node) >= min_len:
+                break
+            node, idx = path.pop()
+            self._fix_child(node, idx)
+        root = self._root
+        if root.children is not None and len(root.children) == 1:
+            self._root = root.children[0]
+        return self
+
+    @staticmethod
+    def _length(node):
+        """
+        The number of items of a leaf, or children of an internal node.
+        """
+        return len(node.keys) if node.children is None else len(node.children)
+
+    def _split(self, node):
+        """
+        Cut the right half off the node, return its key and the new node.
+        Return (None, None) if a leaf could not be split.
+        """
+        if node.children is None:
+            keys = node.keys
+            mid = self._split_point(keys, 0, len(keys))
+            if mid is None:
+                return None, None
+            right = _BNode(keys[mid:])
+            del keys[mid:]
+            return right.keys[0], right
+        mid = len(node.children) / 2
+        key = node.keys[mid - 1]
+        right = _BNode(node.keys[mid:], node.children[mid:])
+        del node.keys[mid - 1:]
+        del node.children[mid:]
+        return key, right
+
+    @staticmethod
+    def _split_point(keys, lo, hi):
+        """
+        Return the split point nearest to the middle of keys[lo:hi] where
+        keys[mid-1] < keys[mid], or None if all of them are equal.
+        """
+        mid = (lo + hi) / 2
+        left = bisect_left(keys, keys[mid], lo, mid)
+        right = bisect_right(keys, keys[mid], mid, hi)
+        if left > lo and (mid - left <= right - mid or right == hi):
+            return left
+        if right < hi:
+            return right
+        return None
+
+    def _fix_child(self, parent, idx):
+        """
+        Merge parent.children[idx] with its sibling, or split both evenly.
+        """
+        if idx == len(parent.children) - 1:
+            idx -= 1
+        left, right = parent.children[idx], parent.children[idx + 1]
+        if left.children is None:
+            keys = left.keys + right.keys
+            if len(keys) <= self._fanout:
+                mid = None
+            else:
+                mid = self._split_point(keys, 0, len(keys))
+            if mid is None:
+                left.keys = keys
+            else:
+                left.keys, right.keys = keys[:mid], keys[mid:]
+                parent.keys[idx] = keys[mid]
+                return
+        else:
+            keys = left.keys + [parent.keys[idx]] + right.keys
+            children = left.children + right.children
+            if len(children) <= self._fanout:
+                left.keys, left.children = keys, children
+            else:
+                mid = len(children) / 2
+                left.keys, left.children = keys[:mid - 1], children[:mid]
+                right.keys, right.children = keys[mid:], children[mid:]
+                parent.keys[idx] = keys[mid - 1]
+                return
+        del parent.keys[idx]
+        del parent.children[idx + 1]
+
+
+# ===========================
+#  TEST-concerning
+# ===========================
+def btree_test():
+    import random
+
+    def check(node, lo, hi, fanout, is_root):
+        # return the depth of leaves, and check the order and the node sizes,
+        # a leaf split away from a run of equal items could be smaller
+        if node.children is None:
+            assert node.keys == sorted(node.keys)
+            assert all((lo is None or lo <= x) and (hi is None or x < hi) for x in node.keys)
+            assert is_root or len(node.keys) >= fanout / 2 or duplicates
+            return 0
+        assert len(node.keys) == len(node.children) - 1
+        assert len(node.children) <= fanout
+        assert len(node.children) >= (2 if is_root else fanout / 2)
+        bounds = [lo] + node.keys + [hi]
+        depths = set(check(child, bounds[i], bounds[i+1], fanout, False)
+                     for i, child in enumerate(node.children))
+        assert len(depths) == 1
+        return depths.pop() + 1
+
+    for fanout in (4, 5, 16):
+        for length in (0, 1, 10, 1000):
+            duplicates = random.random() < 0.5
+            if duplicates:
+                test = [random.randint(0, length) for i in xrange(length)]
+            else:
+                test = random.sample(xrange(length + 2), length)
+            tree = BTree.createFromList(test, fanout)
+            check(tree._root, None, None, fanout, True)
+            assert list(tree) == sorted(test)
+            assert len(tree) == length
+            if test:
+                assert tree.findMin().val == min(test)
+                assert tree.findMax().val == max(test)
+            for x in xrange(-1, length + 2):
+                node = tree.find(x)
+                assert (node is not None) == (x in test)
+                assert node is None or node.val == x
+            random.shuffle(test)
+            left = sorted(test)
+            for x in test:
+                tree.delete(x)
+                left.remove(x)
+                check(tree._root, None, None, fanout, True)
+                if random.random() < 0.05:
+                    assert list(tree) == left
+            assert list(tree) == [] and tree.findMin() is None and tree.findMax() is None
+    # many equal items
+    duplicates = True
+    tree = BTree.createFromList([1] * 50 + [0, 2] * 10, fanout=4)
+    check(tree._root, None, None, 4, True)
+    for i in xrange(50):
+        tree.delete(1)
+    assert list(tree) == [0] * 10 + [2] * 10
+    try:
+        tree.delete(1)
+        assert False
+    except ValueError:
+        pass
+    print "b-tree test passed!"
+
+
+def structure_bytes(root):
+    """
+    Bytes of the nodes and lists reachable from root, the items not counted.
+    """
+    import sys
+    total, stack = 0, [root]
+    while stack:
+        node = stack.pop()
+        total += sys.getsizeof(node)
+        if isinstance(node, _BNode):
+            total += sys.getsizeof(node.keys)
+            if node.children is not None:
+                total += sys.getsizeof(node.children)
+                stack.extend(node.children)
+        else:
+            total += sys.getsizeof(node.__dict__)
+            stack.extend(child for child in (node.left, node.right) if child)
+    return total
+
+
+def btree_benchmark(length=1000000, fanouts=(64, 256)):
+    """
+    Compare memory per key and insert/find/delete throughput of BTree with
+    BST of 002_Binary_Search_Tree.py and AVL of 003_AVL_Tree.py.
+    """
+    import imp, os, random
+    from time import time
+    here = os.path.dirname(os.path.abspath(__file__))
+    bst_module = imp.load_source('bst_module', os.path.join(here, '002_Binary_Search_Tree.py'))
+    avl_module = imp.load_source('avl_module', os.path.join(here, '003_AVL_Tree.py'))
+    test = [random.random() for i in xrange(length)]
+    lookups = list(test)
+    random.shuffle(lookups)
+
+    def bst_insert(tree, x):
+        tree.insert(x)
+        return tree
+
+    def bst_delete(tree, x):
+        return tree.delete(x) or tree
+
+    trees = [("BTree(%d)" % fanout, lambda fanout=fanout: BTree(fanout),
+              BTree.insert, BTree.delete, lambda tree: tree._root)
+             for fanout in fanouts]
+    trees.append(("BST (002)", bst_module.BST, bst_insert, bst_delete, lambda tree: tree))
+    trees.append(("AVL (003)", avl_module.AVL, avl_module.AVL.insert,
+                  avl_module.AVL.delete, lambda tree: tree))
+    print "tree            bytes/key   insert/s    find/s      delete/s"
+    for name, new_tree, insert, delete, root in trees:
+        tree = new_tree()
+        start = time()
+        for x in test:
+            tree = insert(tree, x)
+        insert_rate = length / (time() - start)
+        memory = float(structure_bytes(root(tree))) / length
+        find = tree.find
+        start = time()
+        for x in lookups:
+            find(x)
+        find_rate = length / (time() - start)
+        start = time()
+        for x in lookups:
+            tree = delete(tree, x)
+        delete_rate = length / (time() - start)
+        print "%-15s %9.1f %10d %10d %10d" % (name, memory, insert_rate, find_rate, delete_rate)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+    btree_test()
+    # btree_benchmark()
@@ -0,0 +1,310 @@
+# Top-Down Splay Tree in 'Data Structure and Algorithm Analysis' 12.1
+#
+# Keypoint: After every access the accessed node is rotated to the root, so the
+#           items used often stay near the root. Any M operations take
+#           O(MlogN) in total, and a skewed access pattern is faster than
+#           that, close to the entropy of the access distribution.
+#
+# Top-Down: The bottom-up splay of 'Data Structure and Algorithm Analysis' 4.5
+#           walks down to the node and rotates it up on the way back, which
+#           needs a parent pointer or a recursion. The top-down splay does the
+#           rotations on the way down: the nodes smaller than the item are
+#           linked into a left tree, the nodes larger than the item into a right
+#           tree, and at the end the two trees become the children of the new
+#           root. It is a single loop with O(1) extra memory.
+#
+# Interface: find, insert, delete, findMin and findMax as AVL (003) does. find,
+#           findMin and findMax also splay, so they change the root, and
+#           SplayTree keeps the root instead of being the root node itself.
+#           insert and delete change the tree in place and return it, so
+#           `tree = tree.insert(x)` works the same as for AVL.
+#
+# splay_benchmark, 100000 keys inserted in random order, 1000000 finds:
+#
+#   access              SplayTree find/s    AVL find/s
+#   uniform                    67091          154633
+#   zipf s=1.0                119646          210463
+#   zipf s=1.5                358188          348593
+#
+#   Every find of SplayTree also pays the rotations in Python, about twice the
+#   work of an AVL find per level. It is only worth it for heavily skewed
+#   access, where the hot keys are found in a few steps from the root.
+#
+
+class BinaryTree(object):
+    def __init__(self, content=-1):
+        self.val = content
+        self.left = None
+        self.right = None
+
+    def display(self):
+        def print_tree(tree, depth):
+            if tree:
+                if depth:
+                    print "|  " * (depth-1) + '+--+' +str(tree.val)
+                else:
+                    print '+' +str(tree.val)
+
+                if tree.left or tree.right:
+                    print_tree(tree.left, depth+1)
+                    print_tree(tree.right, depth+1)
+            else:
+                print "  " * depth + 'None'
+
+        print_tree(self, 0)
+
+
+class SplayTree(object):
+    def __init__(self):
+        self._root = None
+        self._size = 0
+
+    @classmethod
+    def createFromList(cls, in_list):
+        tree = cls()
+        for item in in_list:
+            tree.insert(item)
+        return tree
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        stack, this_tree = [], self._root
+        while stack or this_tree:
+            while this_tree:
+                stack.append(this_tree)
+                this_tree = this_tree.left
+            this_tree = stack.pop()
+            yield this_tree.val
+            this_tree = this_tree.right
+
+    def display(self):
+        if self._root:
+            self._root.display()
+        else:
+            print '+EmptyNode'
+
+    @staticmethod
+    def _splay(tree, match):
+        """
+        Top-down splay, return the new root of tree: the node of match, or
+        the last node on the search path of match.
+        """
+        # header.right is the left tree, header.left is the right tree
+        header = BinaryTree(None)
+        left_max = right_min = header
+        while True:
+            val = tree.val
+            if match < val:
+                child = tree.left
+                if child is None:
+                    break
+                if match < child.val:
+                    # zig-zig: rotate with left child
+                    tree.left = child.right
+                    child.right = tree
+                    tree = child
+                    if tree.left is None:
+                        break
+                # link into the right tree
+                right_min.left = tree
+                right_min = tree
+                tree = tree.left
+            elif match > val:
+                child = tree.right
+                if child is None:
+                    break
+                if match > child.val:
+                    # zig-zig: rotate with right child
+                    tree.right = child.left
+                    child.left = tree
+                    tree = child
+                    if tree.right is None:
+                        break
+                # link into the left tree
+                left_max.right = tree
+                left_max = tree
+                tree = tree.right
+            else:
+                break
+        # reassemble
+        left_max.right = tree.left
+        right_min.left = tree.right
+        tree.left = header.right
+        tree.right = header.left
+        return tree
+
+    def find(self, match):
+        """
+        find item in the splay tree, the node found becomes the root
+
+        >>> tree = SplayTree.createFromList([5, 3, 8, 1])
+        >>> tree.find(3).val, tree._root.val, tree.find(4)
+        (3, 3, None)
+        """
+        if self._root is None:
+            return None
+        self._root = SplayTree._splay(self._root, match)
+        return self._root if self._root.val == match else None
+
+    def findMin(self):
+        """
+        return the node with the smallest value, None if the tree is empty
+        """
+        this_tree = self._root
+        if this_tree is None:
+            return None
+        while this_tree.left:
+            this_tree = this_tree.left
+        self._root = SplayTree._splay(self._root, this_tree.val)
+        return self._root
+
+    def findMax(self):
+        """
+        return the node with the largest value, None if the tree is empty
+        """
+        this_tree = self._root
+        if this_tree is None:
+            return None
+        while this_tree.right:
+            this_tree = this_tree.right
+        self._root = SplayTree._splay(self._root, this_tree.val)
+        return self._root
+
+    def insert(self, content):
+        """
+        Insert content as the new root, duplicates are kept.
+
+        >>> tree = SplayTree()
+        >>> for x in [5, 1, 9, 3, 5]:
+        ...     tree = tree.insert(x)
+        >>> list(tree), tree.findMin().val, tree.findMax().val
+        ([1, 3, 5, 5, 9], 1, 9)
+        """
+        new_node = BinaryTree(content)
+        self._size += 1
+        if self._root is None:
+            self._root = new_node
+            return self
+        root = SplayTree._splay(self._root, content)
+        if content < root.val:
+            new_node.left, new_node.right = root.left, root
+            root.left = None
+        else:
+            new_node.left, new_node.right = root, root.right
+            root.right = None
+        self._root = new_node
+        return self
+
+    def delete(self, match):
+        """
+        Delete one item equal to match, raise ValueError if not found.
+
+        >>> tree = SplayTree.createFromList(range(10))
+        >>> for x in range(0, 10, 2):
+        ...     tree = tree.delete(x)
+        >>> list(tree)
+        [1, 3, 5, 7, 9]
+        """
+        if self._root is None:
+            raise ValueError("deletion node not found!!")
+        root = SplayTree._splay(self._root, match)
+        if root.val != match:
+            self._root = root
+            raise ValueError("deletion node not found!!")
+        if root.left is None:
+            self._root = root.right
+        else:
+            # all items of the left subtree are <= match, splaying match
+            # brings the largest one to the root
+            new_root = SplayTree._splay(root.left, match)
+            this_tree = new_root
+            # the right subtree is not empty only if it holds items equal to match
+            while this_tree.right:
+                this_tree = this_tree.right
+            this_tree.right = root.right
+            self._root = new_root
+        self._size -= 1
+        return self
+
+
+# ===========================
+#  TEST-concerning
+# ===========================
+def splay_test():
+    import random
+    for length in (0, 1, 10, 500):
+        test = [random.randint(0, length) for i in xrange(length)]
+        tree = SplayTree.createFromList(test)
+        left = sorted(test)
+        assert list(tree) == left and len(tree) == length
+        for i in xrange(length):
+            x = random.randint(-1, length + 1)
+            node = tree.find(x)
+            assert (node is not None) == (x in test)
+            assert list(tree) == left
+        random.shuffle(test)
+        for x in test:
+            if random.random() < 0.3:
+                assert tree.findMin().val == left[0]
+                assert tree.findMax().val == left[-1]
+            tree.delete(x)
+            left.remove(x)
+            assert list(tree) == left and len(tree) == len(left)
+        assert tree.findMin() is None and tree.findMax() is None
+        try:
+            tree.delete(0)
+            assert False
+        except ValueError:
+            pass
+    print "splay tree test passed!"
+
+
+def zipf_trace(keys, length, s):
+    """
+    Return `length` random keys, the i-th key is drawn with probability
+    proportional to 1 / i**s.
+    """
+    import random
+    from bisect import bisect_left
+    weights, total = [], 0.0
+    for i in xrange(1, len(keys) + 1):
+        total += 1.0 / i ** s
+        weights.append(total)
+    return [keys[bisect_left(weights, random.random() * total)] for i in xrange(length)]
+
+
+def splay_benchmark(length=100000, finds=1000000, skews=(1.0, 1.5)):
+    """
+    Compare find throughput of SplayTree and AVL of 003_AVL_Tree.py on
+    uniform and Zipf access traces.
+    """
+    import imp, os, random
+    from time import time
+    avl_module = imp.load_source('avl_module',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), '003_AVL_Tree.py'))
+    keys = random.sample(xrange(length * 10), length)
+    splay = SplayTree.createFromList(keys)
+    avl = avl_module.AVL.createFromList(keys)
+    # the hot keys are spread over the whole key range
+    random.shuffle(keys)
+    traces = [("uniform", [random.choice(keys) for i in xrange(finds)])]
+    traces.extend(("zipf s=%.1f" % s, zipf_trace(keys, finds, s)) for s in skews)
+    print "access              SplayTree find/s    AVL find/s"
+    for name, trace in traces:
+        rates = []
+        for tree in (splay, avl):
+            find = tree.find
+            start = time()
+            for x in trace:
+                find(x)
+            rates.append(finds / (time() - start))
+        print "%-16s %14d %15d" % (name, rates[0], rates[1])
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+    splay_test()
+    # splay_benchmark()
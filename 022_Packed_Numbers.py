@@ -0,0 +1,156 @@
+# Packed Numbers for the snapshots of 005, 007, 008, 009 and 018
+#
+# Those files load this one by imp.load_source, the same as 017 loads
+# 005_Binary_Heap.py, so the packing and the pickling support live here once.
+#
+# Format:   pack_numbers turns a list of ints or floats into one string of
+#           little-endian numbers with a fixed width, '<i', '<q' or '<d', and
+#           returns the format with it. The bytes are the same on every
+#           machine: array packs them with the typecode of the same size here,
+#           and they are byteswapped on a big-endian machine. If this machine
+#           has no array typecode of that size (no 8-byte one in Python 2 on
+#           Windows), unpack_numbers reads them by struct. Anything else is
+#           kept as the list itself.
+#
+# Cost:     unpack_numbers reads the string by array.fromstring and builds the
+#           list by tolist(), so a restore copies the numbers and builds every
+#           int or float object again, it is not zero-copy. What packing saves
+#           is the pickle size and the dump time, cPickle no longer writes one
+#           opcode per number. The load is only faster when the numbers are all
+#           that has to be built, e.g. 007 and 009. When the objects around
+#           them have to be built again anyway, e.g. the HeapNodes of 018, the
+#           load is as slow as unpickling them, or slower.
+#
+# Snapshot: a mixin for a class with snapshot() and __setstate__(snapshot).
+#           restore(snapshot) builds an object from a snapshot without
+#           __init__, and pickling writes the snapshot instead of __dict__.
+#
+
+import copy_reg
+import struct
+import sys
+from array import array
+
+
+def _array_typecode(itemsize, typecodes):
+    """
+    Return the first array typecode of `itemsize` bytes on this machine,
+    None if there is none.
+    """
+    for typecode in typecodes:
+        try:
+            if array(typecode).itemsize == itemsize:
+                return typecode
+        except ValueError:
+            pass
+    return None
+
+
+# struct format -> the array typecode of the same size on this machine
+_ARRAY_TYPECODES = {'<i': _array_typecode(4, 'il'), '<q': _array_typecode(8, 'lq'), '<d': 'd'}
+
+
+def pack_numbers(values):
+    """
+    Return (format, string) of values packed as '<i', '<q' or '<d', or
+    (None, values) if they are not all ints or all floats.
+
+    >>> pack_numbers([1, -2]) == ('<i', '\\x01\\x00\\x00\\x00\\xfe\\xff\\xff\\xff')
+    True
+    >>> pack_numbers([1, 'a'])
+    (None, [1, 'a'])
+    """
+    for fmt in ('<i', '<q'):
+        typecode = _ARRAY_TYPECODES[fmt]
+        if typecode is None:
+            continue
+        try:
+            packed = array(typecode, values)
+            break
+        except (TypeError, OverflowError):
+            pass
+    else:
+        if set(map(type, values)) != set([float]):
+            return None, values
+        fmt, packed = '<d', array('d', values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return fmt, packed.tostring()
+
+
+def unpack_numbers(fmt, data):
+    """
+    Return the list packed by pack_numbers, data could be any read-only
+    buffer, e.g. buffer(mmap_object, offset, size).
+    """
+    if fmt is None:
+        return list(data)
+    typecode = _ARRAY_TYPECODES[fmt]
+    if typecode is None:
+        count = len(data) / struct.calcsize(fmt)
+        return list(struct.unpack('<%d%s' % (count, fmt[1]), data))
+    values = array(typecode)
+    values.fromstring(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tolist()
+
+
+class Snapshot(object):
+    """
+    Mixin of restore and pickling for a class with snapshot() and
+    __setstate__(snapshot).
+    """
+    __slots__ = ()
+
+    @classmethod
+    def restore(cls, snapshot):
+        res = cls.__new__(cls)
+        res.__setstate__(snapshot)
+        return res
+
+    def __reduce_ex__(self, protocol):
+        return (copy_reg.__newobj__, (self.__class__,), self.snapshot())
+
+
+def pickle_benchmark(obj):
+    """
+    Compare pickling the __dict__ of obj, which is what pickle does without
+    __reduce_ex__, with pickling obj by its snapshot.
+    """
+    import cPickle as pickle
+    from time import time
+    for name, target in (("pickle of __dict__", obj.__dict__), ("pickle by snapshot", obj)):
+        start = time()
+        data = pickle.dumps(target, 2)
+        dump_time = time() - start
+        start = time()
+        pickle.loads(data)
+        print "%-22s size %d    dump %f    load %f" % (name, len(data), dump_time, time() - start)
+
+
+def packed_test():
+    import cPickle as pickle
+    import random
+    for values in ([], [1, -2], [2**40, -1], [0.5, 2.0, float('inf')],
+                   [random.randint(-2**62, 2**62) for i in xrange(100)],
+                   [1, 0.5], [1, 2**70], [(1, 2)], ['a']):
+        fmt, data = pack_numbers(values)
+        if fmt is not None:
+            assert data == struct.pack('<%d%s' % (len(values), fmt[1]), *values)
+        assert unpack_numbers(fmt, data) == values
+        assert unpack_numbers(*pickle.loads(pickle.dumps((fmt, data), 2))) == values
+    # a machine without an array typecode of 8 bytes
+    typecodes = dict(_ARRAY_TYPECODES)
+    try:
+        _ARRAY_TYPECODES['<q'] = None
+        assert unpack_numbers('<q', struct.pack('<2q', 2**40, -1)) == [2**40, -1]
+    finally:
+        _ARRAY_TYPECODES.update(typecodes)
+    print "packed numbers test passed!"
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+    packed_test()